@@ -0,0 +1,127 @@
+""" Music and sound effects.
+
+Everything under sounds/ is loaded and decoded up front, so playing a sound never
+touches the disk. Files that are missing or cannot be decoded are skipped one by
+one. Background music moves to the next track (or loops) from the player's
+end-of-stream event, so nothing polls the stream position each frame.
+One-shot effects play on a small pool of reusable players.
+
+NullAudio has the same interface and does nothing; it is used for headless
+worlds, --mute, and machines without a working audio device.
+"""
+import os
+
+SOUNDS_DIR = "sounds"
+MUSIC_LIST = ["background_music.mp3"]
+EFFECTS = {"sword": "sword.wav",
+           "bow": "bow.wav",
+           "blast": "blast.wav",
+           "death": "death.wav"}
+MUSIC_VOLUME = 0.01
+EFFECT_VOLUME = 0.2
+# Players per effect; a new play steals the oldest one when all are busy
+POOL_SIZE = 4
+
+
+class NullAudio:
+    """ Silent backend """
+
+    def play_music(self):
+        pass
+
+    def play_effect(self, name):
+        pass
+
+    def stop(self):
+        pass
+
+
+class Audio:
+    """ pyglet backend with preloaded sources and pooled effect players """
+
+    def __init__(self, sounds_dir=SOUNDS_DIR, music_volume=MUSIC_VOLUME,
+                 effect_volume=EFFECT_VOLUME):
+        import pyglet.media
+        from pyglet.media.exceptions import MediaException
+        self.media = pyglet.media
+        # What a file that cannot be read or decoded raises; such files are skipped
+        self.load_errors = (MediaException, OSError, EOFError)
+        self.music_volume = music_volume
+        self.effect_volume = effect_volume
+        self.music = [source for source in (self._load(sounds_dir, name) for name in MUSIC_LIST)
+                      if source is not None]
+        self.effects = {}
+        for name, filename in EFFECTS.items():
+            source = self._load(sounds_dir, filename)
+            if source is not None:
+                self.effects[name] = source
+        # Players need the audio driver, so they are made on first use in the game thread
+        self.music_player = None
+        self.current_song = 0
+        self.pools = {}
+        self.next_in_pool = {}
+
+    def _load(self, sounds_dir, filename):
+        path = os.path.join(sounds_dir, filename)
+        if not os.path.exists(path):
+            print(f"Audio: {path} not found, skipping")
+            return None
+        try:
+            # streaming=False decodes the whole file now instead of while playing
+            return self.media.load(path, streaming=False)
+        except self.load_errors as error:
+            # e.g. an mp3 without FFmpeg; the other sounds still load
+            print(f"Audio: cannot decode {path} ({type(error).__name__}: {error}), skipping")
+            return None
+
+    def play_music(self):
+        if not self.music or self.music_player is not None:
+            return
+        self.music_player = self.media.Player()
+        self.music_player.volume = self.music_volume
+        self.music_player.push_handlers(on_eos=self._next_song)
+        self.music_player.queue(self.music[self.current_song])
+        self.music_player.play()
+
+    def _next_song(self):
+        """ End of stream: queue the next track, or the same one again """
+        self.current_song = (self.current_song + 1) % len(self.music)
+        self.music_player.queue(self.music[self.current_song])
+        self.music_player.play()
+
+    def play_effect(self, name):
+        source = self.effects.get(name)
+        if source is None:
+            return
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.pools[name] = [self.media.Player() for _ in range(POOL_SIZE)]
+            for player in pool:
+                player.volume = self.effect_volume
+            self.next_in_pool[name] = 0
+        index = self.next_in_pool[name]
+        self.next_in_pool[name] = (index + 1) % POOL_SIZE
+        player = pool[index]
+        if player.source is not None:
+            player.next_source()
+        player.queue(source)
+        player.play()
+
+    def stop(self):
+        if self.music_player is not None:
+            self.music_player.pause()
+            self.music_player = None
+        for pool in self.pools.values():
+            for player in pool:
+                player.pause()
+
+
+def make_audio(enabled=True):
+    """ The pyglet backend if it can be used, otherwise NullAudio """
+    if not enabled:
+        return NullAudio()
+    try:
+        return Audio()
+    except Exception as error:
+        print(f"Audio disabled: {error}")
+        return NullAudio()
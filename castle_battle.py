@@ -1,274 +1,630 @@
+import time
+# Taken before arcade is imported so the import shows up in the startup breakdown
+_PROCESS_START = time.perf_counter()
+
 import arcade
-import images
+import argparse
 import math
 import random
-import time
+import threading
 import os
+from audio import NullAudio, make_audio
+from render import ActorBatch
+from layout import DOORS, CRACKS, ENEMY_NAMES
 
 SPRITE_SCALING = 0.5
 
 SCREEN_WIDTH = 1750
 SCREEN_HEIGHT = 1000
 SCREEN_TITLE = "CTR Battle Arena"
-MUSIC_VOLUME = 0.01
+# Target time from launch to the first menu frame, in seconds
+STARTUP_BUDGET = 1.0
 SPRITE_PIXEL_SIZE = 128
 GRID_PIXEL_SIZE = (SPRITE_PIXEL_SIZE * SPRITE_SCALING)
 LEFT_LIMIT = 0
 RIGHT_LIMIT = SCREEN_WIDTH
-DOORS = [[1230, 0],
-        [800, 214], [1530, 214],
-        [365, 420], [1100, 420],
-        [650, 620], [1380, 620]]
-CRACKS = [[451, 931], [1296, 931]]
+# Culling: how far outside the viewport things still count as visible, the width of
+# each block of walls drawn together, and how often off-screen enemies are simulated
+CULL_MARGIN = 200
+WALL_CHUNK_WIDTH = SCREEN_WIDTH / 2
+OFFSCREEN_STRIDE = 4
 
 # Physics
 MOVEMENT_SPEED = 10 * SPRITE_SCALING
 JUMP_SPEED = 20 * SPRITE_SCALING
 GRAVITY = .75 * SPRITE_SCALING
 FRICTION = 1.1
+# Cooldowns, in frames
+MOVE_COOLDOWN = 10
+HIT_COOLDOWN = 50
+# Keys that change the player's velocity
+JUMP_KEYS = [arcade.key.UP, arcade.key.W, arcade.key.SPACE]
+LEFT_KEYS = [arcade.key.LEFT, arcade.key.A]
+RIGHT_KEYS = [arcade.key.RIGHT, arcade.key.D]
+MOVE_KEYS = JUMP_KEYS + LEFT_KEYS + RIGHT_KEYS
+
+
+
+class StartupTimer:
+    """ Records how long each startup phase took, measured from process start """
+
+    def __init__(self, start):
+        self.start = start
+        self.phases = []
+
+    def mark(self, phase, started):
+        """ End a phase that began at perf_counter() time started """
+        # Callers pass their own start: the loader thread's phases overlap the main thread's
+        now = time.perf_counter()
+        self.phases.append((phase, now - started, now - self.start))
+
+    def since_start(self, phase):
+        for name, _, total in self.phases:
+            if name == phase:
+                return total
+        return None
+
+    def report(self):
+        lines = [f"  {name:<16}{took:7.3f}s  (at {total:.3f}s)" for name, took, total in self.phases]
+        return "\n".join(["Startup:"] + lines)
+
+
+STARTUP = StartupTimer(_PROCESS_START)
+STARTUP.mark("import arcade", _PROCESS_START)
+
+
+class GameLoader:
+    """ Builds the World and decodes the sounds on a background thread """
+
+    def __init__(self, audio_enabled=True, schedule=None, screens=1):
+        self.audio_enabled = audio_enabled
+        self.schedule = schedule
+        self.screens = screens
+        self.world = None
+        self.audio = None
+        self.error = None
+        self.thread = threading.Thread(target=self._load, name="loader", daemon=True)
+        self.thread.start()
+
+    def _load(self):
+        try:
+            started = time.perf_counter()
+            # Sprites only keep image data until their first draw, so no GL context is needed here
+            self.world = World(Level(self.screens), schedule=self.schedule)
+            arcade.load_texture("images/castle_doors.png")
+            arcade.load_texture("images/tomb.png")
+            STARTUP.mark("level", started)
+            started = time.perf_counter()
+            self.audio = make_audio(self.audio_enabled)
+            STARTUP.mark("audio", started)
+        except Exception as error:
+            self.error = error
+
+    def is_ready(self):
+        return not self.thread.is_alive()
+
+    def result(self):
+        """ Wait for loading to finish; returns (world, audio) """
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.world, self.audio
+
+
+class Level:
+    """ Static level geometry; one level can be shared by several worlds """
+
+    def __init__(self, screens=1):
+        # The castle layout repeats once per screen, side by side
+        self.screens = screens
+        self.width = screens * SCREEN_WIDTH
+        self.doors = [[x + screen * SCREEN_WIDTH, y] for screen in range(screens) for x, y in DOORS]
+        self.cracks = [[x + screen * SCREEN_WIDTH, y] for screen in range(screens) for x, y in CRACKS]
+        # Walls never move: static lists upload once, and the spatial hash keeps
+        # physics collision checks local
+        self.wall_list = arcade.SpriteList(use_spatial_hash=True, is_static=True)
+        self.border_list = arcade.SpriteList(use_spatial_hash=True, is_static=True)
+        self.platform_list = arcade.SpriteList(use_spatial_hash=True, is_static=True)
+        self.floor_list = arcade.SpriteList(use_spatial_hash=True, is_static=True)
+        self.setup()
+        self.chunks = self.make_chunks()
 
+    def setup(self):
+        screen_grid = SCREEN_WIDTH / GRID_PIXEL_SIZE
+        for screen in range(self.screens):
+            x = screen * screen_grid
+            for i in list(range(4)) + list(range(8, 30)):
+                Wall(self.floor_list, x + i, 2.9, "images/floor.png")
+            Wall(self.platform_list, x + 5.6, 1.5, "images/floor.png")
 
+            for i in list(range(9)) + list(range(14, 20)) + list(range(22, 30)):
+                Wall(self.floor_list, x + i, 6.15, "images/floor.png")
+            Wall(self.platform_list, x + 10, 4.75, "images/floor.png")
 
-class GameView(arcade.View):
-    """ Main application class. """
-
-    def __init__(self):
-        super().__init__()
-        #music
-        self.music_list =[]
-        self.current_song = 0
-        self.music = None
-        
+            for i in list(range(5, 14)) + list(range(17, 26)):
+                Wall(self.floor_list, x + i, 9.4, "images/floor.png")
+            Wall(self.platform_list, x + 3, 8, "images/floor.png")
 
-        # Sprite lists
-        self.wall_list = arcade.SpriteList()
-        self.border_list = arcade.SpriteList()
-        self.platform_list = arcade.SpriteList()
-        self.floor_list = arcade.SpriteList()
-        self.player_list = arcade.SpriteList()
-        self.actor_list = arcade.SpriteList()
-        self.enemy_list = arcade.SpriteList()
-        self.background = arcade.load_texture("images/castle_doors.png")
-        self.tomb = arcade.load_texture("images/tomb.png")
-        arcade.set_background_color = None
-        self.setup()
-        self.count_1 = 0
-        self.count_2 = 0
-        self.count_3 = 0
-        self.count_4 = 0
+        #Create Border
+        extra = math.ceil((self.screens - 1) * screen_grid)
+        for i in range(50 + extra):
+            Wall(self.border_list, (i -10), -0.5, ":resources:images/tiles/grassMid.png")
+            Wall(self.border_list, (i - 10), 20, ":resources:images/tiles/grassMid.png")
+        for i in range(50):
+            Wall(self.border_list, -5, i, ":resources:images/tiles/grassMid.png")
+            Wall(self.border_list, 35 + (self.screens - 1) * screen_grid, i, ":resources:images/tiles/grassMid.png")
+        self.floor_list.extend(self.border_list)
+        self.wall_list.extend(self.floor_list)
+        self.wall_list.extend(self.platform_list)
 
-        
+    def make_chunks(self):
+        """ Group the walls into vertical strips so only strips on screen are drawn """
+        strips = {}
+        for wall in self.wall_list:
+            strips.setdefault(int(wall.center_x // WALL_CHUNK_WIDTH), []).append(wall)
+        chunks = []
+        for _, walls in sorted(strips.items()):
+            chunk = arcade.SpriteList(is_static=True)
+            chunk.extend(walls)
+            left = min(wall.left for wall in walls)
+            right = max(wall.right for wall in walls)
+            chunks.append((left, right, chunk))
+        return chunks
+
+
+class ActorList(arcade.SpriteList):
+    """ SpriteList for sprites that come and go
+
+    arcade 2.4's remove() leaves the sprite as a key of sprite_idx, so every
+    arrow, swing and enemy ever killed stayed in memory along with its physics
+    engine.
+    """
+
+    def remove(self, item):
+        super().remove(item)
+        del self.sprite_idx[item]
+
+
+class World:
+    """ Game simulation: actors, level, spawner and tick, independent of any view """
+
+    def __init__(self, level=None, seed=None, schedule=None):
+        # Level geometry is read-only, so it may come from another world
+        self.level = level if level is not None else Level()
+        # Own random source so worlds in one process stay independent
+        self.rng = random.Random(seed)
+        # Optional schedule.SpawnSchedule replacing the random spawner; also shareable
+        self.schedule = schedule
+        self.schedule_index = 0
+        # Left and right x of the area being watched; enemies outside it are simulated less often
+        self.focus = None
+        self.wall_list = self.level.wall_list
+        self.border_list = self.level.border_list
+        self.floor_list = self.level.floor_list
 
-        # List of physics engines, one per actor; allows for multiple actors
-        self.physics_engine = {}
+        # Sprite lists
+        self.actor_list = ActorList()
+        self.enemy_list = ActorList()
 
         self.player_sprite = Player(self.actor_list, self.wall_list, self.enemy_list)
+        self.player_sprite.boundary_right = self.level.width
+        self.sword_upgrades = 0
+        self.bow_upgrades = 0
         self.enemy_cooldown = 0
         self.enemy_count = 1.0
         self.game_over = False
         self.start_time = self.time_lapsed = time.time()
         self.boss_time = False
         self.fighting_boss = False
-        
-
-    def setup(self):    
-        for i in list(range(4)) + list(range(8, 30)):
-            Wall(self.floor_list, i, 2.9, "images/floor.png")
-        Wall(self.platform_list, 5.6, 1.5, "images/floor.png")
-
-        for i in list(range(9)) + list(range(14, 20)) + list(range(22, 30)):
-            Wall(self.floor_list, i, 6.15, "images/floor.png")
-        Wall(self.platform_list, 10, 4.75, "images/floor.png")
-
-        for i in list(range(5, 14)) + list(range(17, 26)):
-            Wall(self.floor_list, i, 9.4, "images/floor.png")
-        Wall(self.platform_list, 3, 8, "images/floor.png")
-
-        #Create Border
-        for i in range(50):
-            Wall(self.border_list, (i -10), -0.5, ":resources:images/tiles/grassMid.png")
-            Wall(self.border_list, -5, i, ":resources:images/tiles/grassMid.png")
-            Wall(self.border_list, 35, i, ":resources:images/tiles/grassMid.png")
-            Wall(self.border_list, (i - 10), 20, ":resources:images/tiles/grassMid.png")
-        self.floor_list.extend(self.border_list)
-        self.wall_list.extend(self.floor_list) 
-        self.wall_list.extend(self.platform_list)
-
-         # List of music
-        self.music_list = ["sounds/background_music.mp3"]
-        # Array index of what to play
-        self.current_song = 0
-        # Play the song
-        self.play_song()
-
-    def play_song(self):
-        """ Play the song. """
-        # Stop what is currently playing.
-        if self.music:
-            self.music.stop()
-
-        self.music = arcade.Sound(self.music_list[self.current_song], streaming=True)
-        self.music.play(MUSIC_VOLUME)
-
-    def on_update(self, delta_time):
-        # Call update on all sprites
-        for engine in self.physics_engine.values():
-            engine.update()
-
-        # If the player falls off the platform, game over
-        if self.player_sprite.is_dead():
-            arcade.close_window()
-        
-        for actor in self.actor_list:
-            actor.update()
-            if actor.physics_engine is not None:
-                actor.physics_engine.update()
+        self.boss = None
+        self.ticks = 0
+        # Sound effects for attacks and deaths; views swap in a real backend
+        self.audio = NullAudio()
+        # What happened during the last tick, for telemetry
+        self.spawned = []
+        self.coins_earned = 0
+        self.tick_time = 0.0
+
+    def tick(self):
+        """ Advance the simulation by one frame """
+        start = time.perf_counter()
+        self.ticks += 1
+        self.spawned = []
+        self.coins_earned = 0
+        boss_shots = self.boss.shots if self.fighting_boss else 0
+        dead = []
+        for index, actor in enumerate(self.actor_list):
+            if not isinstance(actor, Enemy):
+                actor.update()
+                elapsed = 1
+            elif (self.focus is None or self.in_focus(actor) or actor.updated_at is None
+                    or (self.ticks + index) % OFFSCREEN_STRIDE == 0
+                    or self.ticks - actor.updated_at >= OFFSCREEN_STRIDE):
+                # Cooldowns and physics advance by every tick since the last update,
+                # so enemies simulated less often off screen still keep time
+                elapsed = 1 if actor.updated_at is None else self.ticks - actor.updated_at
+                actor.update(elapsed)
+                actor.updated_at = self.ticks
+            else:
+                elapsed = 0
+            if isinstance(actor, (Arrow, Blast)) and not (
+                    -CULL_MARGIN < actor.center_x < self.level.width + CULL_MARGIN):
+                # Missed shots leave the arena instead of flying on forever
+                actor.health = 0
+            if actor.physics_engine is not None and elapsed:
+                step_physics(actor, elapsed)
             if not actor.is_alive():
-                if actor in self.enemy_list:
-                    self.player_sprite.coins += actor.value
-                if actor is self.player_sprite:
-                    self.game_over = True
-                else:
-                    actor.position = [-100, -100]
-                actor.kill()
-        
+                dead.append(actor)
+        # Killed after the loop: removing from actor_list while iterating it would
+        # skip the actor after every death. Shots fired this tick are still iterated.
+        for actor in dead:
+            if actor in self.enemy_list:
+                self.player_sprite.coins += actor.value
+                self.coins_earned += actor.value
+                self.audio.play_effect("death")
+            if actor is self.player_sprite:
+                self.game_over = True
+            else:
+                actor.position = [-100, -100]
+            actor.kill()
+
+        if self.fighting_boss and self.boss.shots > boss_shots:
+            self.audio.play_effect("blast")
+
         if self.enemy_cooldown > 0:
             self.enemy_cooldown -= 1
         else:
             self.enemy_cooldown = 500
             self.enemy_count += 0.1
-            if self.boss_time == False:
-                for _ in range(int(self.enemy_count)):
-                    enemy_choice = random.randint(1, 200)
-                    if enemy_choice < 50:
-                        Orc(self.player_sprite, self.actor_list, self.enemy_list, self.wall_list)
-                    elif enemy_choice < 130:
-                        Goblin(self.player_sprite, self.actor_list, self.enemy_list, self.wall_list)
-                    elif enemy_choice < 180:
-                       Skeleton(self.player_sprite, self.actor_list, self.enemy_list, self.wall_list)
-                    elif enemy_choice < 190:
-                        Cyclops(self.player_sprite, self.actor_list, self.enemy_list, self.floor_list)
-                    else:
-                        Dragon(self.player_sprite, self.actor_list, self.enemy_list, self.border_list)
-                
+            if self.boss_time == False and self.schedule is None:
+                self.spawn_wave()
+        if self.schedule is not None:
+            self.spawn_scheduled()
 
         if self.boss_time == True and self.fighting_boss == False:
-            Wizard(self.player_sprite, self.actor_list, self.enemy_list, self.wall_list)
+            self.boss = self.spawn_enemy(Wizard)
             self.fighting_boss = True
 
-        if self.fighting_boss == True and Wizard.is_alive == False:
+        if self.fighting_boss == True and not self.boss.is_alive():
             self.boss_time = False
             self.fighting_boss = False
 
-        position = self.music.get_stream_position()
+        self.tick_time = time.perf_counter() - start
+
+    def spawn_wave(self):
+        for _ in range(int(self.enemy_count)):
+            enemy_choice = self.rng.randint(1, 200)
+            if enemy_choice < 50:
+                self.spawn_enemy(Orc)
+            elif enemy_choice < 130:
+                self.spawn_enemy(Goblin)
+            elif enemy_choice < 180:
+                self.spawn_enemy(Skeleton)
+            elif enemy_choice < 190:
+                self.spawn_enemy(Cyclops)
+            else:
+                self.spawn_enemy(Dragon)
+
+    def spawn_enemy(self, enemy_class, position=None):
+        """ Create an enemy against the walls it collides with, at a door or crack """
+        if enemy_class is Cyclops:
+            walls = self.floor_list
+        elif enemy_class is Dragon:
+            walls = self.border_list
+        else:
+            walls = self.wall_list
+        enemy = enemy_class(self.player_sprite, self.actor_list, self.enemy_list, walls)
+        enemy.boundary_right = self.level.width
+        if position is None:
+            position = self.rng.choice(self.level.cracks if enemy_class is Dragon else self.level.doors)
+        enemy.position = position
+        self.spawned.append(enemy_class.__name__)
+        return enemy
+
+    def spawn_scheduled(self):
+        """ Spawn the schedule rows that are due by this tick """
+        rows = self.schedule.rows
+        while self.schedule_index < len(rows) and rows[self.schedule_index][0] <= self.ticks:
+            _, _, enemy_type, door, health, damage = rows[self.schedule_index]
+            self.schedule_index += 1
+            # Like the random spawner, waves that fall during the boss fight are skipped
+            if self.boss_time:
+                continue
+            enemy_class = ENEMY_TYPES[enemy_type]
+            spawn_points = self.level.cracks if enemy_class is Dragon else self.level.doors
+            enemy = self.spawn_enemy(enemy_class, spawn_points[door % len(spawn_points)])
+            enemy.health *= health
+            enemy.damage *= damage
+            if hasattr(enemy, "damage_arrow"):
+                enemy.damage_arrow *= damage
+
+    def in_focus(self, actor):
+        left, right = self.focus
+        return actor.right >= left and actor.left <= right
+
+    def elapsed_time(self):
+        """ Seconds survived; the clock stops when the game is over """
+        if not self.game_over:
+            self.time_lapsed = time.time() - self.start_time
+        return self.time_lapsed
+
+    def player_attack(self, button):
+        """ Attack with the weapon for this mouse button; returns the weapon used, or None """
+        weapon = self.player_sprite.on_mouse_press(self.actor_list, button)
+        if weapon is not None:
+            self.audio.play_effect(weapon)
+        return weapon
+
+    # Upgrades, bought from the pause screen
+    def buy_health(self):
+        if self.player_sprite.coins >= 20:
+            self.player_sprite.health += 25
+            self.player_sprite.coins -= 20
+
+    def upgrade_sword(self):
+        if self.player_sprite.coins >= 30:
+            self.sword_upgrades += 1
+            self.player_sprite.damage *= (1 + 1/(2*self.sword_upgrades))
+            self.player_sprite.coins -= 30
+
+    def upgrade_bow(self):
+        if self.player_sprite.coins >= 30:
+            self.bow_upgrades += 1
+            self.player_sprite.damage_arrow *= (1 + 1/(2*self.bow_upgrades))
+            self.player_sprite.coins -= 30
+
+    def summon_boss(self):
+        self.boss_time = True
+
+
+class Camera:
+    """ Horizontal viewport that follows the player across a wide level """
+
+    def __init__(self, level_width):
+        self.level_width = level_width
+        self.left = 0
+        # A single-screen level never scrolls, so nothing needs culling
+        self.scrolls = level_width > SCREEN_WIDTH
+
+    @property
+    def right(self):
+        return self.left + SCREEN_WIDTH
+
+    def follow(self, x):
+        if self.scrolls:
+            self.left = int(min(max(x - SCREEN_WIDTH / 2, 0), self.level_width - SCREEN_WIDTH))
+
+    def bounds(self, margin=CULL_MARGIN):
+        return self.left - margin, self.right + margin
+
+    def sees(self, sprite, margin=CULL_MARGIN):
+        return sprite.right >= self.left - margin and sprite.left <= self.right + margin
 
-        if position == 0.0:
-            self.play_song()
+    def apply(self):
+        if self.scrolls:
+            arcade.set_viewport(self.left, self.right, 0, SCREEN_HEIGHT)
+
+    def reset(self):
+        if self.scrolls:
+            arcade.set_viewport(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT)
+
+
+class GameView(arcade.View):
+    """ Main application class; draws a World and feeds it input """
+
+    def __init__(self, world=None, server=None, telemetry=None, audio=None, probe=None):
+        super().__init__()
+        self.world = world if world is not None else World()
+        # Optional spectator.StateServer and telemetry.TelemetrySink, fed once per tick
+        self.server = server
+        self.telemetry = telemetry
+        # Optional latency.LatencyProbe told about every input and finished frame
+        self.probe = probe
+        self.background = arcade.load_texture("images/castle_doors.png")
+        self.tomb = arcade.load_texture("images/tomb.png")
+        arcade.set_background_color = None
+
+        # Music loops on its own; starting it again on reset does nothing
+        self.audio = audio if audio is not None else make_audio()
+        self.world.audio = self.audio
+        self.audio.play_music()
+
+        self.camera = Camera(self.world.level.width)
+        # Actors are drawn from persistent slots; the GPU culls those outside the view
+        self.actor_batch = ActorBatch()
+
+    def on_update(self, delta_time):
+        # If the player falls off the platform, game over
+        if self.world.player_sprite.is_dead():
+            arcade.close_window()
+
+        self.camera.follow(self.world.player_sprite.center_x)
+        if self.camera.scrolls:
+            self.world.focus = self.camera.bounds()
+        self.world.tick()
+        if self.server is not None:
+            self.server.publish(self.world)
+        if self.telemetry is not None:
+            self.telemetry.record(self.world, delta_time)
 
-#50, 130, 180
     def on_key_press(self, key, modifiers):
-        self.player_sprite.on_key_press(key)
+        player = self.world.player_sprite
+        velocity_x = player.change_x
+        player.on_key_press(key)
+        if self.probe is not None and key in MOVE_KEYS:
+            self.probe_move(key, velocity_x)
         if key in [arcade.key.ESCAPE]:
             upgrade_view = UpgradeView(self)
             self.window.show_view(upgrade_view)
-        elif key == arcade.key.ENTER and self.game_over is True:  # reset game
-            game = GameView()
-            self.window.show_view(game)
+        elif key == arcade.key.ENTER and self.world.game_over is True:  # reset game
+            self.window.show_view(self.new_game())
+
+    def probe_move(self, key, velocity_x):
+        """ Report a movement key to the latency probe, with a check for that key's own effect """
+        player = self.world.player_sprite
+        if key in JUMP_KEYS:
+            # The key handler sets the jump speed itself, or does nothing in mid-air
+            jumped = player.change_y == JUMP_SPEED
+            self.probe.input("jump", lambda: jumped)
+            return
+        direction, sign = ("L", -1) if key in LEFT_KEYS else ("R", 1)
+        if (direction == "L" and player.left <= player.boundary_left
+                or direction == "R" and player.right >= player.boundary_right):
+            # Walking into the edge of the level has no effect to wait for
+            return
+        last_x = [velocity_x]
+
+        def walked():
+            # Player.update accelerates toward the walking direction once per tick;
+            # friction and gravity never push change_x that way
+            accelerated = (player.change_x - last_x[0]) * sign > 0
+            last_x[0] = player.change_x
+            return accelerated and player.walking and player.direction == direction
+        self.probe.input("walk", walked)
+
+    def on_hide_view(self):
+        # Menus draw in screen coordinates
+        self.camera.reset()
+        if self.probe is not None:
+            self.probe.pause()
+
+    def new_game(self):
+        """ A fresh game that keeps this one's level, schedule and hooks """
+        world = World(self.world.level, schedule=self.world.schedule)
+        return GameView(world, self.server, self.telemetry, self.audio, self.probe)
 
     def on_key_release(self, key, modifiers):
-        self.player_sprite.on_key_release(key)
+        self.world.player_sprite.on_key_release(key)
     
     def on_mouse_press(self, _x, _y, button, _modifiers):
-        self.player_sprite.on_mouse_press(self.actor_list, button)
+        weapon = self.world.player_attack(button)
+        if self.probe is not None:
+            if weapon is None:
+                self.probe.input("attack", lambda: False)
+            else:
+                # The swing or arrow already exists, so the next frame shows it
+                self.probe.input("swing" if weapon == "sword" else "arrow", lambda: True)
 
     def on_draw(self):
         """ Render the screen. """
+        world = self.world
+        player = world.player_sprite
+        camera = self.camera
         arcade.start_render()
-
-        # Draw the background texture
-        arcade.draw_lrwh_rectangle_textured(0, -SCREEN_WIDTH * .12,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT * 1.25,
-                                            self.background)
-        arcade.draw_rectangle_filled(75, 970, 150, 60, arcade.color.BLACK)
+        camera.apply()
+        # HUD positions are relative to the left edge of the view
+        hud = camera.left
+
+        # Draw the background texture, once per screen of level in view
+        for screen in range(world.level.screens):
+            x = screen * SCREEN_WIDTH
+            if x < camera.right and x + SCREEN_WIDTH > camera.left:
+                arcade.draw_lrwh_rectangle_textured(x, -SCREEN_WIDTH * .12,
+                                                    SCREEN_WIDTH, SCREEN_HEIGHT * 1.25,
+                                                    self.background)
+        arcade.draw_rectangle_filled(hud + 75, 970, 150, 60, arcade.color.BLACK)
 
         # Draw the sprites.
-        self.wall_list.draw()
-        self.actor_list.draw()
+        if camera.scrolls:
+            left, right = camera.bounds()
+            for chunk_left, chunk_right, chunk in world.level.chunks:
+                if chunk_right >= left and chunk_left <= right:
+                    chunk.draw()
+        else:
+            world.wall_list.draw()
+        # Only actors near the view are kept in the batch and written to the GPU
+        self.actor_batch.sync(world.actor_list, camera.sees if camera.scrolls else None)
+        self.actor_batch.draw()
 
         # Draw health
-        for actor in self.actor_list:
-            if actor.show_health:        
+        for actor in self.actor_batch:
+            if actor.show_health:
                 actor_health = int(actor.health)
                 output = f"{actor_health}"
                 x = actor.center_x - 10
                 y = actor.center_y + 20
                 arcade.draw_text(output, x, y, arcade.color.RED, 14)
 
-        if self.player_sprite.health <= 0:
-            tomb_x = int(self.player_sprite.center_x)
-            tomb_y = int(self.player_sprite.center_y)
+        if player.health <= 0:
+            tomb_x = int(player.center_x)
+            tomb_y = int(player.center_y)
             arcade.draw_lrwh_rectangle_textured(tomb_x - 20, tomb_y - 30, 75, 100, self.tomb)
-           
-        
 
         # Put the text on the screen.
-        health = int(self.player_sprite.health)
-        if self.player_sprite.health <= 0:
+        health = int(player.health)
+        if player.health <= 0:
             output = f"Health: {0}"
         else:
             output = f"Health: {health}"
-        arcade.draw_text(output, 10, 970,
+        arcade.draw_text(output, hud + 10, 970,
                          arcade.color.RED, 20)
-        coins = self.player_sprite.coins
+        coins = player.coins
         output = f"Coins: {coins}"
-        arcade.draw_text(output, 10, 940, arcade.color.YELLOW, 20)
+        arcade.draw_text(output, hud + 10, 940, arcade.color.YELLOW, 20)
 
-        end_time = time.time()
-        if not self.game_over:
-            self.time_lapsed = end_time - self.start_time
-        mins = self.time_lapsed // 60
-        secs = int(self.time_lapsed % 60)
+        time_lapsed = world.elapsed_time()
+        mins = time_lapsed // 60
+        secs = int(time_lapsed % 60)
         hrs = int(mins // 60)
         mins = int(mins % 60)
         output = f"{hrs}:{mins}:{secs}"
-        arcade.draw_text(output, 1600, 960, arcade.color.WHITE, 30)
+        arcade.draw_text(output, hud + 1600, 960, arcade.color.WHITE, 30)
 
-        if self.game_over:
-            arcade.draw_text("Game Over", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
+        if world.game_over:
+            arcade.draw_text("Game Over", hud + SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
             arcade.color.BLACK, font_size=50, anchor_x="center")
             arcade.draw_text("Press Enter to reset",
-                         SCREEN_WIDTH / 2,
+                         hud + SCREEN_WIDTH / 2,
                          SCREEN_HEIGHT / 2-30,
                          arcade.color.BLACK,
                          font_size=20,
                          anchor_x="center")
 
-        position = self.music.get_stream_position()
-        length = self.music.get_length()
-        
-        size = 20
-        margin = size * .5
+        if self.probe is not None:
+            self.probe.frame_drawn()
 
         
 class InstructionView(arcade.View):
     """ View to show instructions """
 
+    def __init__(self, server=None, telemetry=None, show_startup=False, audio_enabled=True,
+                 schedule=None, screens=1, probe=None):
+        super().__init__()
+        self.probe = probe
+        self.audio_enabled = audio_enabled
+        self.schedule = schedule
+        self.screens = screens
+        self.server = server
+        self.telemetry = telemetry
+        self.show_startup = show_startup
+        self.loader = None
+        self.start_requested = False
+        self.first_frame = True
+
     def on_show(self):
+        started = time.perf_counter()
         self.count = 0
         self.background_1 = arcade.load_texture("images/menu_1.png")
         self.background_2 = arcade.load_texture("images/menu_2.png")
         self.background_3 = arcade.load_texture("images/menu_3.png")
-        self.player_icon = arcade.load_texture("images/knight.png")
+        self.player_icon = arcade.load_texture("images/Knight.png")
         arcade.set_background_color = None
+        STARTUP.mark("menu textures", started)
+        # The level, physics and music load while the menu animates
+        if self.loader is None:
+            self.loader = GameLoader(self.audio_enabled, self.schedule, self.screens)
     
     def on_update(self, delta_time):
         if self.count < 30:
             self.count += 1
         else:
             self.count = 0
+        if self.start_requested and self.loader.is_ready():
+            self.start_game()
     
     def on_draw(self):
         """ Render the screen. """
+        started = time.perf_counter()
         arcade.start_render()
 
         if self.count < 10:
@@ -281,7 +637,11 @@ class InstructionView(arcade.View):
         arcade.draw_lrwh_rectangle_textured(1200, 100, 150, 150, self.player_icon)
 
 
-        arcade.draw_text("Click to Start", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
+        if self.loader.is_ready():
+            title = "Click to Start"
+        else:
+            title = "Loading..."
+        arcade.draw_text(title, SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
                          arcade.color.WHITE, font_size=50, anchor_x="center")
         arcade.draw_text("Controls: ", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2-75,
                          arcade.color.WHITE, font_size=20, anchor_x="center")
@@ -294,15 +654,32 @@ class InstructionView(arcade.View):
         arcade.draw_text("ESC - Upgrade Menu / Pause ", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2-175,
                          arcade.color.WHITE, font_size=20, anchor_x="center")
 
+        if self.first_frame:
+            self.first_frame = False
+            STARTUP.mark("first frame", started)
+            first_frame = STARTUP.since_start("first frame")
+            if self.show_startup or first_frame > STARTUP_BUDGET:
+                print(STARTUP.report())
+                print(f"Time to first frame {first_frame:.3f}s, budget {STARTUP_BUDGET:.3f}s")
+
     def on_mouse_press(self, _x, _y, _button, _modifiers):
         """ If the user presses the mouse button, start the game. """
-        self.window.show_view(GameView())
+        # Clicks during loading start the game as soon as it is ready
+        self.start_requested = True
+        if self.loader.is_ready():
+            self.start_game()
+
+    def start_game(self):
+        world, audio = self.loader.result()
+        if self.show_startup:
+            print(STARTUP.report())
+        self.window.show_view(GameView(world, self.server, self.telemetry, audio, self.probe))
 
 class UpgradeView(arcade.View):
     def __init__(self, game_view):
         super().__init__()
         self.game_view = game_view
-        self.boss_time = game_view.boss_time
+        self.world = game_view.world
 
     def on_show(self):
         arcade.set_background_color(arcade.color.SKY_BLUE)
@@ -350,36 +727,52 @@ class UpgradeView(arcade.View):
                          arcade.color.WHITE,
                          font_size=20,
                          anchor_x="center")
-        health = int(self.game_view.player_sprite.health)
+        health = int(self.world.player_sprite.health)
         output = f"Health: {health}"
         arcade.draw_text(output, 10, 970,
                          arcade.color.RED, 20)
-        coins = self.game_view.player_sprite.coins
+        coins = self.world.player_sprite.coins
         output = f"Coins: {coins}"
         arcade.draw_text(output, 10, 940, arcade.color.YELLOW, 20)
 
     def on_key_press(self, key, _modifiers):
         if key == arcade.key.ESCAPE:   # resume game
-            self.game_view.player_sprite.walking = False
+            self.world.player_sprite.walking = False
             self.window.show_view(self.game_view)
         elif key == arcade.key.ENTER:  # reset game
-            game = GameView()
-            self.window.show_view(game)
-        elif key == arcade.key.KEY_1 and self.game_view.player_sprite.coins >= 20:
-            self.game_view.player_sprite.health += 25
-            self.game_view.player_sprite.coins -= 20
-        elif key == arcade.key.KEY_2 and self.game_view.player_sprite.coins >= 30:
-            self.game_view.count_2 += 1
-            self.game_view.player_sprite.damage *= (1 + 1/(2*self.game_view.count_2))
-            self.game_view.player_sprite.coins -= 30
-        elif key == arcade.key.KEY_3 and self.game_view.player_sprite.coins >= 30:
-            self.game_view.count_3 += 1
-            self.game_view.player_sprite.damage_arrow *= (1 + 1/(2*self.game_view.count_3))
-            self.game_view.player_sprite.coins -= 30
+            self.window.show_view(self.game_view.new_game())
+        elif key == arcade.key.KEY_1:
+            self.world.buy_health()
+        elif key == arcade.key.KEY_2:
+            self.world.upgrade_sword()
+        elif key == arcade.key.KEY_3:
+            self.world.upgrade_bow()
         elif key == arcade.key.KEY_4:
-            self.game_view.boss_time = True
+            self.world.summon_boss()
         
 
+# Index of each facing into a texture pair
+FACING = {"L": 0, "R": 1}
+_texture_pairs = {}
+
+
+def texture_pair(img):
+    """ Left- and right-facing textures for an image, loaded once and shared by all sprites """
+    pair = _texture_pairs.get(img)
+    if pair is None:
+        pair = (arcade.load_texture(img), arcade.load_texture(img, flipped_horizontally=True))
+        _texture_pairs[img] = pair
+    return pair
+
+
+def show_pair(sprite, pair, direction):
+    """ Show the side of a texture pair facing direction """
+    # ActorBatch reads pair and facing when the texture changes, so they go first
+    sprite.pair = pair
+    sprite.facing = FACING[direction]
+    sprite.texture = pair[sprite.facing]
+
+
 class Actor(arcade.Sprite):
     """ All dynamic sprites inherit this """
     def __init__(self, actor_list, wall_list):
@@ -388,10 +781,14 @@ class Actor(arcade.Sprite):
         self.boundary_left = LEFT_LIMIT
         self.boundary_right = RIGHT_LIMIT
         self.textures = {}
+        # The texture pair shown and the index of the current facing into it
+        self.pair = None
+        self.facing = None
         # Make the sprite drawn and have physics applied
         actor_list.append(self)
         self.physics_engine = arcade.PhysicsEnginePlatformer(self, wall_list, gravity_constant=GRAVITY)
         self.show_health = True
+        self.damage_taken = 0
     
     def set_vel(self, x_vel = None, y_vel = None):
         if x_vel is not None:
@@ -403,18 +800,22 @@ class Actor(arcade.Sprite):
         return self.health > 0
     
     def add_texture(self, img, name):
-        self.textures[name] = {"L": arcade.load_texture(img), "R": arcade.load_texture(img, flipped_horizontally=True)}
+        self.textures[name] = texture_pair(img)
+
+    def show_texture(self, name, direction):
+        show_pair(self, self.textures[name], direction)
     
     def take_damage(self, source):
         self.health -= source.damage
+        self.damage_taken += source.damage
         x_distance = self.center_x - source.center_x
         y_distance = self.center_y - source.center_y
         distance = math.hypot(x_distance, y_distance)
         self.accelerate((source.knockback * x_distance) / distance, (source.knockback * y_distance) / distance)
     
     def accelerate(self, x_accel=None, y_accel=None):
-        if (x_accel is not None and (self.left > LEFT_LIMIT and x_accel < 0
-                or self.right < RIGHT_LIMIT and x_accel > 0)):
+        if (x_accel is not None and (self.left > self.boundary_left and x_accel < 0
+                or self.right < self.boundary_right and x_accel > 0)):
             self.change_x += x_accel
         if y_accel is not None:
             self.change_y += y_accel
@@ -423,9 +824,9 @@ class Player(Actor):
     """ Sprite for the player """
     def __init__(self, actor_list, wall_list, enemy_list):
         super().__init__(actor_list, wall_list)
-        self.add_texture("images/knight.png", "idle")
-        self.add_texture("images/knight_sword.png", "sword")
-        self.add_texture("images/knight_bow.png", "bow")
+        self.add_texture("images/Knight.png", "idle")
+        self.add_texture("images/Knight_Sword.png", "sword")
+        self.add_texture("images/Knight_Bow.png", "bow")
         self.scale = SPRITE_SCALING/4
         self.position = [216, 0]
         self.enemies = enemy_list
@@ -440,70 +841,76 @@ class Player(Actor):
         self.weapon = "sword"
         self.hit_cooldown = 0
         self.move_cooldown = 0
-        self.texture = self.textures["idle"][self.direction]
+        self.show_texture("idle", self.direction)
         self.arrows = []
         self.coins = 30
         self.show_health = False
+        self.damage_dealt = 0
 
     def is_dead(self):
         return self.center_y < -5 * GRID_PIXEL_SIZE
 
     def on_key_press(self, key):
-        if key in [arcade.key.UP, arcade.key.W, arcade.key.SPACE] and self.physics_engine.can_jump():
+        if key in JUMP_KEYS and self.physics_engine.can_jump():
             self.change_y = JUMP_SPEED
         elif key in [arcade.key.LEFT, arcade.key.A]:
             self.walking = True
             self.direction = "L"
-            self.texture = self.textures["idle"][self.direction]
-        elif key in [arcade.key.RIGHT, arcade.key.D] and self.right < RIGHT_LIMIT:
+            self.show_texture("idle", self.direction)
+        elif key in [arcade.key.RIGHT, arcade.key.D] and self.right < self.boundary_right:
             self.walking = True
             self.direction = "R"
-            self.texture = self.textures["idle"][self.direction]
+            self.show_texture("idle", self.direction)
 
 
     def on_key_release(self, key):
         if (key in [arcade.key.LEFT, arcade.key.A] and self.direction == "L"
                 or key in [arcade.key.RIGHT, arcade.key.D] and self.direction == "R"):
             self.walking = False
-        if key in [arcade.key.UP, arcade.key.W, arcade.key.SPACE] and self.change_y > 0:
+        if key in JUMP_KEYS and self.change_y > 0:
             self.change_y *= 0.5
 
     def on_mouse_press(self, actor_list, button):
+        """ Attack if ready; returns the weapon used, or None """
         if self.move_cooldown == 0:
-            self.move_cooldown = 10
+            self.move_cooldown = MOVE_COOLDOWN
             if button == arcade.MOUSE_BUTTON_LEFT:
                 self.swing_sword(actor_list)
+                return "sword"
             if button == arcade.MOUSE_BUTTON_RIGHT:
                 self.fire_bow(actor_list)
+                return "bow"
+        return None
 
     def swing_sword(self, actor_list):
         if self.direction == "L":
             x_pos = self.left - 20
         else:
             x_pos = self.right + 20
-        self.texture = self.textures["sword"][self.direction]
+        self.show_texture("sword", self.direction)
         swing = Swing(actor_list, [x_pos, self.center_y], self.direction)
         for enemy in self.enemies:
             if swing.collides_with_sprite(enemy):
                     enemy.take_damage(self)
+                    self.damage_dealt += self.damage
     
     def fire_bow(self, actor_list):
         if self.direction == "L":
             x_pos = self.left - 20
         else:
             x_pos = self.right + 20
-        self.texture = self.textures["bow"][self.direction]
+        self.show_texture("bow", self.direction)
         self.arrows.append(Arrow(actor_list, [x_pos, self.center_y + 10], self.direction, self.damage_arrow))
     
     def update(self):
-        if (self.left <= LEFT_LIMIT and self.direction == "L"
-                or self.right >= RIGHT_LIMIT and self.direction == "R"):
+        if (self.left <= self.boundary_left and self.direction == "L"
+                or self.right >= self.boundary_right and self.direction == "R"):
             self.change_x = 0
         if self.hit_cooldown == 0:    
             for enemy in self.enemies:
                 if self.collides_with_sprite(enemy):
                     self.take_damage(enemy)
-                    self.hit_cooldown = 50
+                    self.hit_cooldown = HIT_COOLDOWN
         if self.move_cooldown > 0:
             self.move_cooldown -= 1
         if abs(self.change_x) > 0 and self.physics_engine.can_jump and (not self.walking or abs(self.change_x) > self.speed):
@@ -515,10 +922,13 @@ class Player(Actor):
         if self.hit_cooldown > 0:
             self.hit_cooldown -= 1
 
+        # Spent arrows are dropped so the list does not grow for the whole game
+        self.arrows = [arrow for arrow in self.arrows if arrow.is_alive()]
         for arrow in self.arrows:
             for enemy in self.enemies:
                 if arrow.collides_with_sprite(enemy):
                         enemy.take_damage(arrow)
+                        self.damage_dealt += arrow.damage
                         arrow.health -= 1
 
 
@@ -531,11 +941,7 @@ class Swing(arcade.Sprite):
         self.physics_engine = None
         self.position = pos
         self.scale = 1.5
-        if direction == "L":
-            self.texture = arcade.load_texture("images/swing.png")
-        else:
-            self.texture = arcade.load_texture("images/swing.png", 
-                                        flipped_horizontally=True)
+        show_pair(self, texture_pair("images/swing.png"), direction)
         
     def is_alive(self):
         return self.health > 0
@@ -550,13 +956,11 @@ class Arrow(arcade.Sprite):
         self.physics_engine = arcade.PhysicsEnginePlatformer(self, arcade.SpriteList(), gravity_constant=0)
         self.health = 1
         self.show_health = False
+        show_pair(self, texture_pair("images/arrow.png"), direction)
         if direction == "L":
-            self.texture = arcade.load_texture("images/arrow.png")
             self.change_x = -5
         else:
             self.change_x = 5
-            self.texture = arcade.load_texture("images/arrow.png",
-                                        flipped_horizontally=True)
         self.damage = damage
         self.scale = 0.1
         self.position = pos
@@ -575,13 +979,11 @@ class Blast(arcade.Sprite):
         self.physics_engine = arcade.PhysicsEnginePlatformer(self, arcade.SpriteList(), gravity_constant=0)
         self.health = 1
         self.show_health = False
+        show_pair(self, texture_pair("images/wizard_blast.png"), direction)
         if direction == "L":
-            self.texture = arcade.load_texture("images/wizard_blast.png")
             self.change_x = -5
         else:
             self.change_x = 5
-            self.texture = arcade.load_texture("images/wizard_blast.png",
-                                        flipped_horizontally=True)
         self.damage = damage
         self.scale = 0.1
         self.position = pos
@@ -600,17 +1002,55 @@ class Wall(arcade.Sprite):
         self.position = [x_pos * GRID_PIXEL_SIZE, y_pos * GRID_PIXEL_SIZE]
         wall_list.append(self)
 
+
+def run_down(cooldown, ticks, reset):
+    """ Advance a cooldown by ticks; returns (new value, whether it expired and restarted at reset) """
+    left = cooldown - ticks
+    if left >= 0:
+        return left, False
+    return reset + left + 1, True
+
+
+def step_physics(sprite, ticks):
+    """ Run ticks physics steps of a sprite as one move with one collision pass
+
+    The sprite ends with the velocity and, barring walls, the position the
+    single steps would have given it. World.tick never asks for more than
+    OFFSCREEN_STRIDE ticks, which keeps the move shorter than a wall is thick.
+    """
+    engine = sprite.physics_engine
+    if ticks == 1:
+        engine.update()
+        return
+    gravity = engine.gravity_constant
+    change_x, change_y = sprite.change_x, sprite.change_y
+    sprite.change_x = change_x * ticks
+    # The engine zeroes change_y on landing. Each step of a sprite resting on a floor
+    # only presses it in by one step of gravity, so that is all the move needs;
+    # anything deeper is pushed back out a quarter pixel at a time.
+    if change_y != 0:
+        # Distance fallen over the steps; the engine takes one gravity step off itself
+        sprite.change_y = change_y * ticks - gravity * ticks * (ticks + 1) / 2 + gravity
+    engine.update()
+    sprite.change_x = change_x
+    # A floor or ceiling hit leaves change_y at 0
+    if sprite.change_y != 0:
+        sprite.change_y = change_y - gravity * ticks
+
+
 class Enemy(Actor):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(actor_list, wall_list)
         self.prey = player
         enemy_list.append(self)
+        # World tick of the last update(), so a throttled update can catch its cooldowns up
+        self.updated_at = None
 
 class Orc(Enemy):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.add_texture("images/orc.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.scale = SPRITE_SCALING/3.25
 
         self.position = random.choice(DOORS)
@@ -624,13 +1064,13 @@ class Orc(Enemy):
         self.prey = player
         self.upgrade_cooldown = 1000
         
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
         if (self.bottom + 10 < self.prey.bottom and self.physics_engine.can_jump()
                 and abs(self.center_x - self.prey.center_x) < 150):
             self.change_y = self.jump_height
@@ -638,10 +1078,8 @@ class Orc(Enemy):
         if self.physics_engine.can_jump and abs(self.change_x) > self.speed:
             self.change_x /= FRICTION
 
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage *= 1.1
 
@@ -649,7 +1087,7 @@ class Goblin(Enemy):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.add_texture("images/goblin.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.scale = SPRITE_SCALING/4
 
         self.position = random.choice(DOORS)
@@ -663,13 +1101,13 @@ class Goblin(Enemy):
         self.prey = player
         self.upgrade_cooldown = 1000
         
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
         if (self.bottom + 10 < self.prey.bottom and self.physics_engine.can_jump()
                 and abs(self.center_x - self.prey.center_x) < 150):
             self.change_y = self.jump_height
@@ -677,10 +1115,8 @@ class Goblin(Enemy):
         if self.physics_engine.can_jump and abs(self.change_x) > self.speed:
             self.change_x /= FRICTION
         
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage *= 1.1
 
@@ -688,7 +1124,7 @@ class Skeleton(Enemy):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.add_texture("images/skeleton.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.direction = "R"
         self.scale = SPRITE_SCALING/3.25
         self.actor_list = actor_list
@@ -707,16 +1143,16 @@ class Skeleton(Enemy):
         self.arrows = []
         self.walking = True
         
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             if self.walking:
                 self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
             self.direction = "R"
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             if self.walking:
                 self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
             self.direction = "L"
         self.walking = abs(self.center_x - self.prey.center_x) > 400 or abs(self.center_y - self.prey.center_y) > 100
 
@@ -727,19 +1163,16 @@ class Skeleton(Enemy):
         if self.physics_engine.can_jump and abs(self.change_x) > self.speed or not self.walking:
             self.change_x /= FRICTION
 
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage_arrow *= 1.1
 
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= 1
-        else:
-            self.shoot_cooldown = 50
+        self.shoot_cooldown, expired = run_down(self.shoot_cooldown, ticks, 50)
+        if expired:
             self.fire_bow(self.actor_list)
         
+        self.arrows = [arrow for arrow in self.arrows if arrow.is_alive()]
         for arrow in self.arrows:
             if arrow.collides_with_sprite(self.prey):
                 self.prey.take_damage(arrow)
@@ -759,7 +1192,7 @@ class Dragon(Enemy):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.physics_engine = arcade.PhysicsEnginePlatformer(self, wall_list, gravity_constant=0)
         self.add_texture("images/dragon.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.scale = SPRITE_SCALING/1.5
 
         self.position = random.choice(CRACKS)
@@ -773,23 +1206,21 @@ class Dragon(Enemy):
         self.value = 50
         self.upgrade_cooldown = 1000
 
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
 
         if self.center_y < self.prey.center_y and self.change_y < self.speed:
             self.change_y += self.accel
         elif self.center_y > self.prey.center_y and self.change_y > -self.speed:
             self.change_y -= self.accel
 
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage *= 1.1
         
@@ -797,7 +1228,7 @@ class Cyclops(Enemy):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.add_texture("images/cyclops.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.scale = SPRITE_SCALING/2
 
         self.position = random.choice(DOORS)
@@ -811,13 +1242,13 @@ class Cyclops(Enemy):
         self.prey = player
         self.upgrade_cooldown = 1000
         
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
         if (self.bottom + 10 < self.prey.bottom and self.physics_engine.can_jump()
                 and abs(self.center_x - self.prey.center_x) < 150):
             self.change_y = self.jump_height
@@ -825,10 +1256,8 @@ class Cyclops(Enemy):
         if self.physics_engine.can_jump and abs(self.change_x) > self.speed:
             self.change_x /= FRICTION
 
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage *= 1.1
 
@@ -836,7 +1265,7 @@ class Wizard(Enemy):
     def __init__(self, player, actor_list, enemy_list, wall_list):
         super().__init__(player, actor_list, enemy_list, wall_list)
         self.add_texture("images/wizard.png", "idle")
-        self.texture = self.textures["idle"]["R"]
+        self.show_texture("idle", "R")
         self.direction = "R"
         self.scale = SPRITE_SCALING/3
         self.actor_list = actor_list
@@ -853,18 +1282,19 @@ class Wizard(Enemy):
         self.upgrade_cooldown = 1000
         self.shoot_cooldown = 100
         self.arrows = []
+        self.shots = 0
         self.walking = True
         
-    def update(self):
+    def update(self, ticks=1):
         if self.center_x < self.prey.center_x and self.change_x < self.speed:
             if self.walking:
                 self.change_x += self.accel
-            self.texture = self.textures["idle"]["R"]
+            self.show_texture("idle", "R")
             self.direction = "R"
         elif self.center_x > self.prey.center_x and self.change_x > -self.speed:
             if self.walking:
                 self.change_x -= self.accel
-            self.texture = self.textures["idle"]["L"]
+            self.show_texture("idle", "L")
             self.direction = "L"
         self.walking = abs(self.center_x - self.prey.center_x) > 400 or abs(self.center_y - self.prey.center_y) > 100
 
@@ -875,19 +1305,16 @@ class Wizard(Enemy):
         if self.physics_engine.can_jump and abs(self.change_x) > self.speed or not self.walking:
             self.change_x /= FRICTION
 
-        if self.upgrade_cooldown > 0:
-            self.upgrade_cooldown -= 1
-        else:
-            self.upgrade_cooldown = 1000
+        self.upgrade_cooldown, expired = run_down(self.upgrade_cooldown, ticks, 1000)
+        if expired:
             self.health *= 1.1
             self.damage_arrow *= 1.1
 
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= 1
-        else:
-            self.shoot_cooldown = 50
+        self.shoot_cooldown, expired = run_down(self.shoot_cooldown, ticks, 50)
+        if expired:
             self.fire_bow(self.actor_list)
         
+        self.arrows = [arrow for arrow in self.arrows if arrow.is_alive()]
         for arrow in self.arrows:
             if arrow.collides_with_sprite(self.prey):
                 self.prey.take_damage(arrow)
@@ -901,13 +1328,70 @@ class Wizard(Enemy):
         else:
             x_pos = self.right + 20
         self.arrows.append(Blast(actor_list, [x_pos, self.center_y + 10], self.direction, self.damage_arrow))
+        self.shots += 1
+
+# Enemy classes by name, for spawn schedules
+ENEMY_TYPES = {name: globals()[name] for name in ENEMY_NAMES}
+
 
 def main():
     """ Main method """
-    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, fullscreen=True)
-    start_view = InstructionView()
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="stream game state to spectators on this local port")
+    parser.add_argument("--telemetry", metavar="FILE",
+                        help="append per-tick game metrics to this file")
+    parser.add_argument("--telemetry-every", type=int, default=1, metavar="N",
+                        help="write one telemetry record every N ticks")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long each startup phase took")
+    parser.add_argument("--mute", action="store_true",
+                        help="run without music or sound effects")
+    parser.add_argument("--schedule", metavar="FILE",
+                        help="spawn from a compiled schedule (see schedule.py)")
+    parser.add_argument("--screens", type=int, default=1, metavar="N",
+                        help="make the arena N screens wide, with a scrolling camera")
+    parser.add_argument("--latency", action="store_true",
+                        help="measure input latency and frame pacing, reported on exit")
+    parser.add_argument("--update-rate", type=float, default=60, metavar="HZ",
+                        help="game loop updates per second")
+    args = parser.parse_args()
+
+    server = None
+    if args.serve is not None:
+        from spectator import StateServer
+        server = StateServer(port=args.serve)
+    telemetry = None
+    if args.telemetry is not None:
+        from telemetry import TelemetrySink
+        telemetry = TelemetrySink(args.telemetry, every=args.telemetry_every)
+    probe = None
+    if args.latency:
+        from latency import LatencyProbe
+        probe = LatencyProbe()
+    schedule = None
+    if args.schedule is not None:
+        from schedule import SpawnSchedule
+        schedule = SpawnSchedule.load(args.schedule)
+
+    started = time.perf_counter()
+    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, fullscreen=True,
+                           update_rate=1 / args.update_rate)
+    STARTUP.mark("window", started)
+    start_view = InstructionView(server, telemetry, show_startup=args.startup_report,
+                                 audio_enabled=not args.mute, schedule=schedule,
+                                 screens=args.screens, probe=probe)
     window.show_view(start_view)
-    arcade.run()
-
-
-main()
\ No newline at end of file
+    try:
+        arcade.run()
+    finally:
+        if server is not None:
+            server.close()
+        if telemetry is not None:
+            telemetry.close()
+        if probe is not None:
+            print(probe.report({"move_cooldown": MOVE_COOLDOWN, "hit_cooldown": HIT_COOLDOWN}))
+
+
+if __name__ == "__main__":
+    main()
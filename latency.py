@@ -0,0 +1,113 @@
+""" Input latency and frame pacing measurement.
+
+GameView reports each input event and each finished frame to a LatencyProbe. An
+input is timestamped when its handler runs, together with a check for its visible
+effect: a new Swing or Arrow, the jump speed, or the player accelerating toward
+the pressed direction. After every frame the probe runs the pending checks, and
+the first frame on which the effect is drawn closes the event. The latency is
+measured to the end of that on_draw, which is when the frame goes to the driver.
+The display itself can add another refresh interval on top. Inputs with no effect
+within MAX_WAIT_FRAMES are counted as missed, for example an attack during its
+cooldown or a jump in mid-air. A walk key pressed against the edge of the level
+is not recorded at all.
+
+Frame pacing is the spread of the intervals between finished frames. Hiding the
+game view, for the pause menu or a new game, pauses the probe, so that gap is not
+counted as an interval. Because Player.move_cooldown and hit_cooldown count
+frames, the report also converts them to milliseconds at the measured frame rate.
+
+    python castle_battle.py --latency
+"""
+import time
+from collections import Counter
+
+MAX_WAIT_FRAMES = 30
+BUCKET_MS = 2
+BAR_WIDTH = 40
+# Histogram rows above the lowest bucket before the rest go into one overflow row
+MAX_BUCKETS = 25
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def histogram(values, bucket_ms=BUCKET_MS, max_buckets=MAX_BUCKETS):
+    """ Text histogram of millisecond values, leaving out empty buckets """
+    lowest = int(min(values) // bucket_ms)
+    overflow = lowest + max_buckets
+    buckets = Counter(min(int(value // bucket_ms), overflow) for value in values)
+    most = max(buckets.values())
+    lines = []
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        bar = "#" * max(1, round(count / most * BAR_WIDTH))
+        low = bucket * bucket_ms
+        span = f"{low:5}+     " if bucket == overflow else f"{low:5}-{low + bucket_ms:<5}"
+        lines.append(f"    {span}ms {count:6} {bar}")
+    return lines
+
+
+class LatencyProbe:
+    """ Pairs input events with the frame that first shows their effect """
+
+    def __init__(self, max_wait_frames=MAX_WAIT_FRAMES):
+        self.max_wait_frames = max_wait_frames
+        # [kind, input time, effect check, frames waited]
+        self.pending = []
+        self.latencies = {}
+        self.missed = Counter()
+        self.frame_intervals = []
+        self.last_frame = None
+
+    def input(self, kind, effect_shown):
+        """ An input just happened; effect_shown() becomes true once its result is in the world """
+        self.pending.append([kind, time.perf_counter(), effect_shown, 0])
+
+    def pause(self):
+        """ Frames stop for a while, e.g. in the pause menu """
+        # The gap is not a frame interval, and inputs before it have no frame to wait for
+        self.last_frame = None
+        self.pending = []
+
+    def frame_drawn(self):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_intervals.append(now - self.last_frame)
+        self.last_frame = now
+
+        still_pending = []
+        for event in self.pending:
+            kind, start, effect_shown, frames = event
+            if effect_shown():
+                self.latencies.setdefault(kind, []).append(now - start)
+            elif frames + 1 >= self.max_wait_frames:
+                self.missed[kind] += 1
+            else:
+                event[3] = frames + 1
+                still_pending.append(event)
+        self.pending = still_pending
+
+    def report(self, cooldowns=None):
+        """ Latency and pacing summary; cooldowns maps names to lengths in frames """
+        lines = ["Input to frame latency:"]
+        for kind, values in sorted(self.latencies.items()):
+            ms = [value * 1000 for value in values]
+            lines.append(f"  {kind}: {len(ms)} events, p50 {percentile(ms, .5):.1f}ms, "
+                         f"p95 {percentile(ms, .95):.1f}ms, max {max(ms):.1f}ms, "
+                         f"{self.missed[kind]} without effect")
+            lines += histogram(ms)
+        for kind in sorted(set(self.missed) - set(self.latencies)):
+            lines.append(f"  {kind}: {self.missed[kind]} without effect")
+
+        if self.frame_intervals:
+            ms = [interval * 1000 for interval in self.frame_intervals]
+            mean = sum(ms) / len(ms)
+            jitter = (sum((value - mean) ** 2 for value in ms) / len(ms)) ** 0.5
+            lines.append(f"Frame pacing: {len(ms)} frames, mean {mean:.2f}ms ({1000 / mean:.1f} fps), "
+                         f"jitter {jitter:.2f}ms, p99 {percentile(ms, .99):.2f}ms")
+            lines += histogram(ms, 1)
+            for name, frames in (cooldowns or {}).items():
+                lines.append(f"  {name}: {frames} frames = {frames * mean:.0f}ms at this frame rate")
+        return "\n".join(lines)
@@ -0,0 +1,16 @@
+""" Level data shared by the game and its offline tools.
+
+Nothing here imports arcade, so tools such as schedule.py can use it without
+opening a display.
+"""
+
+# Spawn points on one screen of the castle: doors for walking enemies, cracks in the
+# ceiling for Dragons
+DOORS = [[1230, 0],
+        [800, 214], [1530, 214],
+        [365, 420], [1100, 420],
+        [650, 620], [1380, 620]]
+CRACKS = [[451, 931], [1296, 931]]
+
+# Enemy class names a spawn schedule may use
+ENEMY_NAMES = ["Orc", "Goblin", "Skeleton", "Cyclops", "Dragon", "Wizard"]
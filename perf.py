@@ -0,0 +1,394 @@
+""" Headless performance regression checks.
+
+Each scenario builds a World, runs it without a window and measures the time per
+tick, split into phases:
+
+    player   Player.update
+    enemies  update() of every Enemy subclass
+    physics  arcade.PhysicsEnginePlatformer.update
+    spawn    World.spawn_enemy
+    other    the rest of World.tick
+
+A scenario fails if it goes over its budget or if any phase is more than
+--tolerance slower than the stored baseline (perf_baseline.json). The report names
+the phases that regressed. Both are relative to the machine: every
+CALIBRATION_EVERY ticks a scenario times a fixed pure-Python loop, outside the
+tick, and its time budgets are multiplied by the mean of those samples over
+REFERENCE_CALIBRATION_MS. The baseline records each scenario's calibration, so it
+is rescaled the same way. Sampling through the run rather than once at startup
+follows a machine whose speed drifts, as shared virtual machines do. Phases are
+only compared with a baseline of the same length, so a shortened soak checks its
+budgets alone.
+
+A separate scaling check doubles the Goblin horde and fails if the tick time
+grows much faster than the number of actors, which is what an O(n^2) loop in
+Player.update or the physics layer looks like. An off-screen check fills a
+four-screen level with Goblins and narrows the view from all four screens to
+one; the tick time has to fall as enemies leave it.
+
+The soak runs the unmodified spawner for 20 game minutes with a bot playing the
+knight (see Fighter), so enemies die and projectiles come and go as in a real
+game. Enemies gain health over time and the bot falls behind, so they pile up
+and the tick grows with them: on a single-core Xeon the soak takes a couple of
+hours, and --soak-minutes shortens it. Its checks are the growth of the current
+resident set over the run and the number of dead projectiles still referenced.
+soak_capped is the quick variant: the knight kills with one hit and waves wait
+while SOAK_ENEMY_CAP enemies are alive, so it keeps a fixed per-tick budget. What
+that hides is exactly what the full soak shows: how the tick, and anything kept
+per enemy, grows as enemies accumulate.
+
+    python perf.py                       # run everything, compare with the baseline
+    python perf.py goblin_horde          # one scenario
+    python perf.py --soak-minutes 2      # everything, with a short soak
+    python perf.py --update-baseline     # record the current numbers as the baseline
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+import arcade
+
+from castle_battle import (World, Level, Player, Orc, Goblin, Skeleton, Cyclops, Dragon,
+                           Wizard, Arrow, Blast, JUMP_SPEED, SCREEN_WIDTH, CULL_MARGIN)
+
+BASELINE_FILE = "perf_baseline.json"
+TOLERANCE = 0.25
+# Doubling the horde may at most multiply the tick time by this (2 is linear, 4 quadratic)
+SCALING_LIMIT = 3.0
+# With one of four screens in view, the tick may take at most this much of the
+# all-in-view time; off-screen enemies run AI and physics every fourth tick
+OFFSCREEN_LIMIT = 0.6
+# Limits per scenario, about 50% above what a single-core Xeon container measured
+# with a calibration of REFERENCE_CALIBRATION_MS: goblin_horde 40.7-44.8ms (nearly
+# all physics), boss_fight 1.0-1.2ms, soak_capped 5.7ms with 65 projectiles held
+# and +10MB resident at the end. Keys ending in _ms scale with the calibration.
+# A 60 fps frame is 16.7ms, so the horde is already too slow to play.
+BUDGETS = {"goblin_horde": {"tick_ms": 65.0},
+           "boss_fight": {"tick_ms": 1.8},
+           "soak": {"rss_growth_mb": 40, "stray_projectiles": 10},
+           "soak_capped": {"tick_ms": 9.0, "rss_growth_mb": 25, "projectiles": 100,
+                           "stray_projectiles": 10}}
+# calibrate() on the machine the budgets above were measured on
+REFERENCE_CALIBRATION_MS = 23.0
+CALIBRATION_EVERY = 100
+PHASES = ["player", "enemies", "physics", "spawn", "other"]
+# Enemies gain 10% health every 1000 ticks, so over 20 minutes an unupgraded knight
+# falls hopelessly behind and a real game would have ended. The soak_capped knight
+# kills with one hit instead, and waves wait while this many enemies are alive. The
+# bot still falls behind in the last few minutes, so the cap is reached there.
+SOAK_ENEMY_CAP = 30
+# Phases too small to time reliably are not compared with the baseline
+MIN_PHASE_MS = 0.05
+
+
+def calibrate():
+    """ Time in ms of a fixed loop of float arithmetic, comparisons and tuple unpacking """
+    # Pure Python, like the hot paths here, and independent of the game code so a
+    # regression in the game cannot hide by slowing the calibration down with it
+    points = [(i * 0.5, (i % 37) * 2.0) for i in range(2000)]
+    start = time.perf_counter()
+    total = 0.0
+    for _ in range(100):
+        for x, y in points:
+            if abs(x - y) < 400:
+                total += x * y
+    return (time.perf_counter() - start) * 1000
+
+
+def scaled(result, factor):
+    """ A copy of a result with every time in it multiplied by factor """
+    return {key: value * factor if key.endswith("_ms") and key != "calibration_ms" else value
+            for key, value in result.items()}
+
+
+def rss_mb():
+    """ Current resident memory of this process, or None where it cannot be read """
+    # Not ru_maxrss: that is the peak of the whole process, so any scenario after
+    # the largest one would show no growth at all
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class PhaseTimer:
+    """ Wraps the hot methods with timers for the duration of a with-block """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.targets = [("player", Player, "update"),
+                        ("physics", arcade.PhysicsEnginePlatformer, "update"),
+                        ("spawn", World, "spawn_enemy")]
+        for enemy_class in [Orc, Goblin, Skeleton, Cyclops, Dragon, Wizard]:
+            self.targets.append(("enemies", enemy_class, "update"))
+        self.originals = []
+
+    def _wrap(self, phase, func):
+        totals = self.totals
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[phase] += clock() - start
+        return timed
+
+    def __enter__(self):
+        for phase, owner, name in self.targets:
+            original = owner.__dict__[name]
+            self.originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(phase, original))
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in self.originals:
+            setattr(owner, name, original)
+        self.originals = []
+
+
+def projectile_counts(world):
+    """ Projectiles still referenced anywhere (live sprites plus shooters' lists), and how many of those are dead """
+    # A live arrow is in both places, so count each one once
+    live = {actor for actor in world.actor_list if isinstance(actor, (Arrow, Blast))}
+    held = set(live)
+    for actor in world.actor_list:
+        held.update(getattr(actor, "arrows", ()))
+    return len(held), len(held - live)
+
+
+def new_world(seed=0, spawner=True, screens=1):
+    random.seed(seed)
+    world = World(Level(screens), seed=seed)
+    # The player has to survive the whole scenario
+    world.player_sprite.health = 1e9
+    if not spawner:
+        world.enemy_cooldown = float("inf")
+    return world
+
+
+def goblin_horde(goblins=100, arrows=50):
+    """ A Goblin horde plus Skeletons with arrows already in the air """
+    world = new_world(spawner=False)
+    for _ in range(goblins):
+        world.spawn_enemy(Goblin)
+    skeletons = [world.spawn_enemy(Skeleton) for _ in range(5)]
+    for i in range(arrows):
+        skeletons[i % len(skeletons)].fire_bow(world.actor_list)
+    return world
+
+
+def boss_fight():
+    """ The Wizard and its Blasts """
+    world = new_world(spawner=False)
+    world.summon_boss()
+    return world
+
+
+def soak():
+    """ The normal spawner over a long game, to catch anything that piles up """
+    return new_world()
+
+
+def soak_capped():
+    """ The soak with a knight that kills with one hit; run it with Fighter(SOAK_ENEMY_CAP) """
+    world = new_world()
+    world.player_sprite.damage = world.player_sprite.damage_arrow = 1e9
+    return world
+
+
+class Fighter:
+    """ Soak bot: patrols the level and attacks the nearest enemy, sword up close and bow otherwise
+
+    A knight that stands still never meets the enemies on the floors above it, so
+    this one walks end to end and jumps whenever it can, as a player would. With a
+    cap, the spawner waits while that many enemies are alive.
+    """
+
+    def __init__(self, cap=None):
+        self.heading = "R"
+        self.cap = cap
+
+    def __call__(self, world):
+        player = world.player_sprite
+        if self.cap is not None and len(world.enemy_list) >= self.cap:
+            # Hold the next wave back, as a player who keeps up with the spawner would
+            world.enemy_cooldown = max(world.enemy_cooldown, 1)
+        if player.left <= player.boundary_left:
+            self.heading = "R"
+        elif player.right >= player.boundary_right:
+            self.heading = "L"
+        if player.physics_engine.can_jump():
+            player.change_y = JUMP_SPEED
+        if world.enemy_list and not player.move_cooldown:
+            target = min(world.enemy_list, key=lambda enemy: abs(enemy.center_x - player.center_x)
+                                                             + abs(enemy.center_y - player.center_y))
+            player.direction = "L" if target.center_x < player.center_x else "R"
+            close = (abs(target.center_x - player.center_x) < 80
+                     and abs(target.center_y - player.center_y) < 60)
+            world.player_attack(arcade.MOUSE_BUTTON_LEFT if close else arcade.MOUSE_BUTTON_RIGHT)
+        player.walking = True
+        player.direction = self.heading
+
+
+def run(world, ticks, controller=None):
+    """ Tick the world; a controller, if given, acts before each tick and is not timed """
+    gc.collect()
+    rss_before = rss_mb()
+    clock = time.perf_counter
+    total = 0.0
+    samples = [calibrate()]
+    with PhaseTimer() as timer:
+        for tick in range(1, ticks + 1):
+            if controller is not None:
+                controller(world)
+            start = clock()
+            world.tick()
+            total += clock() - start
+            if tick % CALIBRATION_EVERY == 0:
+                samples.append(calibrate())
+    timed = sum(timer.totals.values())
+    timer.totals["other"] = max(total - timed, 0.0)
+    projectiles, stray = projectile_counts(world)
+    result = {"ticks": ticks,
+              "calibration_ms": sum(samples) / len(samples),
+              "tick_ms": total / ticks * 1000,
+              "actors": len(world.actor_list),
+              "enemies": len(world.enemy_list),
+              "projectiles": projectiles,
+              "stray_projectiles": stray}
+    for phase in PHASES:
+        result[phase + "_ms"] = timer.totals[phase] / ticks * 1000
+    gc.collect()
+    rss_after = rss_mb()
+    if rss_before is not None:
+        result["rss_growth_mb"] = rss_after - rss_before
+    return result
+
+
+def scenarios(soak_minutes):
+    ticks = int(soak_minutes * 60 * 60)
+    return {"goblin_horde": lambda: run(goblin_horde(), 600),
+            "boss_fight": lambda: run(boss_fight(), 1200),
+            "soak": lambda: run(soak(), ticks, Fighter()),
+            "soak_capped": lambda: run(soak_capped(), ticks, Fighter(SOAK_ENEMY_CAP))}
+
+
+def check_scaling():
+    small = run(goblin_horde(100, 50), 300)["tick_ms"]
+    large = run(goblin_horde(200, 100), 300)["tick_ms"]
+    ratio = large / small
+    ok = ratio <= SCALING_LIMIT
+    print(f"scaling: 2x actors -> {ratio:.2f}x tick time (limit {SCALING_LIMIT:.1f}x)"
+          f"{'' if ok else '  FAIL'}")
+    return ok
+
+
+def check_offscreen(goblins=200, screens=4):
+    """ Narrow the view over a wide level full of Goblins; the tick must get cheaper """
+    times = {}
+    for visible in [screens, screens // 2, 1]:
+        world = new_world(spawner=False, screens=screens)
+        for _ in range(goblins):
+            world.spawn_enemy(Goblin)
+        world.focus = (-CULL_MARGIN, visible * SCREEN_WIDTH + CULL_MARGIN)
+        times[visible] = run(world, 120)["tick_ms"]
+    ratio = times[1] / times[screens]
+    falling = times[1] < times[screens // 2] < times[screens]
+    ok = falling and ratio <= OFFSCREEN_LIMIT
+    steps = ", ".join(f"{visible} in view {ms:.1f}ms" for visible, ms in times.items())
+    print(f"off screen: {steps} of {screens} screens -> {ratio:.2f}x tick time "
+          f"(limit {OFFSCREEN_LIMIT:.1f}x){'' if ok else '  FAIL'}")
+    return ok
+
+
+def compare(name, result, baseline, tolerance):
+    """ Print one scenario's numbers; returns the list of failures """
+    failures = []
+    calibration = result["calibration_ms"]
+    speed = calibration / REFERENCE_CALIBRATION_MS
+    print(f"{name}: {result['actors']} actors ({result['enemies']} enemies), "
+          f"{result['projectiles']} projectiles held, {result['stray_projectiles']} of them dead")
+    print(f"  calibration {calibration:.1f}ms (reference {REFERENCE_CALIBRATION_MS:.1f}ms), "
+          f"time budgets x{speed:.2f}")
+    for key, limit in scaled(BUDGETS.get(name, {}), speed).items():
+        value = result.get(key)
+        if value is not None and value > limit:
+            failures.append(f"{name}: {key} {value:.2f} over budget {limit:.2f}")
+    if baseline is not None and baseline.get("ticks") != result["ticks"]:
+        print(f"  baseline ran {baseline.get('ticks')} ticks, not {result['ticks']}; not compared")
+        baseline = None
+    if baseline is not None:
+        # Bring the baseline to the speed this run saw, so phases compare like for like
+        baseline = scaled(baseline, calibration / baseline["calibration_ms"])
+    for phase in ["tick"] + PHASES:
+        key = phase + "_ms"
+        value = result[key]
+        line = f"  {phase:<8}{value:8.3f}ms"
+        if baseline is not None and key in baseline:
+            before = baseline[key]
+            line += f"  baseline {before:8.3f}ms"
+            if max(value, before) >= MIN_PHASE_MS and value > before * (1 + tolerance):
+                line += "  REGRESSED"
+                failures.append(f"{name}: {phase} {value:.3f}ms vs baseline {before:.3f}ms")
+        print(line)
+    if "rss_growth_mb" in result:
+        print(f"  memory  {result['rss_growth_mb']:+.1f}MB resident")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--soak-minutes", type=float, default=20,
+                        help="game minutes to simulate in the soak scenario")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    available = scenarios(args.soak_minutes)
+    names = args.names or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {list(available)}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as data:
+            baselines = json.load(data)
+    elif not args.update_baseline:
+        print(f"No {args.baseline}; checking budgets only")
+
+    failures = []
+    results = {}
+    for name in names:
+        results[name] = available[name]()
+        failures += compare(name, results[name], baselines.get(name), args.tolerance)
+    if not args.names and not check_scaling():
+        failures.append("scaling: tick time grows faster than the actor count")
+    if not args.names and not check_offscreen():
+        failures.append("off screen: enemies outside the view do not make the tick cheaper")
+
+    if args.update_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as data:
+            json.dump(baselines, data, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
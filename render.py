@@ -0,0 +1,313 @@
+""" Persistent GPU buffers for drawing actors.
+
+arcade.SpriteList throws its vertex buffers away whenever a sprite is added or
+removed, and rebuilds all of them on the next draw. When any sprite has moved it
+also orphans and rewrites the whole position buffer. Actors come and go every few
+ticks (swings, arrows, blasts, deaths), so the actor list was rebuilt from scratch
+on most frames.
+
+ActorBatch keeps one fixed slot per actor instead:
+
+  - A new actor takes the lowest free slot. A killed actor's slot is hidden and
+    goes back on the free list. Buffers are only reallocated when the capacity
+    doubles.
+  - arcade tells the batch about position, size, angle, colour and texture
+    changes the same way it tells any sprite list. Only those slots are marked
+    dirty, and at draw time each run of consecutive dirty slots is one buffer
+    write.
+  - Textures are packed into one atlas with one cell per left/right texture
+    pair. Each slot stores its pair's cell and its facing, the index into the
+    pair. Facing right reads the cell mirrored, so a facing change only
+    rewrites that slot's four texture coordinates. The atlas is rebuilt only
+    when a pair appears that it has not seen.
+  - On a scrolling level, sync() keeps only the actors near the view in the
+    batch. An actor that leaves it gives its slot back and stops notifying the
+    batch, so off-screen movement costs no writes. arcade's culling geometry
+    shader drops whatever lies in the margin around the view.
+
+On the CPU, a frame costs one visibility test per actor plus one slot write per
+visible actor that moved or changed. Spawns and deaths no longer add a rebuild.
+The GPU processes the slots up to the most actors visible at once.
+"""
+import array
+import math
+from heapq import heappop, heappush
+
+import arcade
+from arcade import gl
+from PIL import Image
+
+INITIAL_CAPACITY = 256
+# Free slots are parked far outside any viewport so the culling shader drops them
+HIDDEN = -1e6
+# Identity texture transform; the sprites here are never flipped or rotated by it
+TEXTURE_TRANSFORM = arcade.Matrix3x3().v
+
+# Per-slot attributes: shader input, buffer format, array type and values per slot
+POS, SIZE, ANGLE, TEX, COLOR = range(5)
+LAYOUT = [("in_pos", "2f", "f", 2),
+          ("in_size", "2f", "f", 2),
+          ("in_angle", "1f", "f", 1),
+          ("in_sub_tex_coords", "4f", "f", 4),
+          ("in_color", "4f1", "B", 4)]
+
+
+def padded(image):
+    """ Copy of an image with its edge pixels repeated one pixel outward.
+
+    Same as arcade's own atlas, so filtering at a cell border does not pick up
+    the neighbouring image.
+    """
+    width, height = image.size
+    border = Image.new("RGBA", (width + 2, height + 2))
+    border.paste(image, (1, 1))
+    border.paste(border.crop((1, 1, width + 1, 2)), (1, 0))
+    border.paste(border.crop((1, height, width + 1, height + 1)), (1, height + 1))
+    border.paste(border.crop((1, 0, 2, height + 2)), (0, 0))
+    border.paste(border.crop((width, 0, width + 1, height + 2)), (width + 1, 0))
+    return border
+
+
+def runs(slots):
+    """ Group slot numbers into (first, last + 1) ranges of consecutive slots """
+    ordered = sorted(slots)
+    start = previous = ordered[0]
+    for slot in ordered[1:]:
+        if slot != previous + 1:
+            yield start, previous + 1
+            start = slot
+        previous = slot
+    yield start, previous + 1
+
+
+class ActorBatch:
+    """ Draws a changing set of sprites from persistent per-slot GPU buffers """
+
+    # arcade.Sprite checks these on every list it is registered with
+    _use_spatial_hash = False
+    spatial_hash = None
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.capacity = capacity
+        # sprite -> slot; free holds released slots below used, lowest first
+        self.slots = {}
+        self.free = []
+        self.used = 0
+        self.data = [array.array(kind, [0]) * (capacity * width) for _, _, kind, width in LAYOUT]
+        self.cells = array.array("l", [0]) * capacity
+        self.facings = array.array("b", [0]) * capacity
+        self.dirty = [set() for _ in LAYOUT]
+
+        # Atlas: name of the pair's left texture -> cell number, plus the padded image of each cell
+        self.atlas_cells = {}
+        self.atlas_images = []
+        self.tex_coords = []
+        self.atlas = None
+        self.atlas_stale = False
+
+        self.ctx = None
+        self.program = None
+        self.buffers = None
+        self.geometry = None
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, sprite):
+        return sprite in self.slots
+
+    def __iter__(self):
+        return iter(list(self.slots))
+
+    def sync(self, sprite_list, visible=None):
+        """ Make the batch hold the sprites of sprite_list for which visible(sprite) is true
+
+        Without visible, every sprite is held and only those appended since the
+        last call are added.
+        """
+        sprites = sprite_list.sprite_list
+        if visible is None:
+            # kill() removes a sprite from the batch along with its other lists, so
+            # the sprites not in the batch yet are always the tail of sprite_list
+            for index in range(len(self.slots), len(sprites)):
+                if sprites[index] not in self.slots:
+                    self.append(sprites[index])
+            return
+        for sprite in sprites:
+            shown = visible(sprite)
+            if shown and sprite not in self.slots:
+                self.append(sprite)
+            elif not shown and sprite in self.slots:
+                self.remove(sprite)
+
+    def append(self, sprite):
+        if self.free:
+            slot = heappop(self.free)
+        else:
+            if self.used == self.capacity:
+                self._grow()
+            slot = self.used
+            self.used += 1
+        self.slots[sprite] = slot
+        sprite.register_sprite_list(self)
+        self._set_position(slot, sprite)
+        self._set_size(slot, sprite)
+        self._set_angle(slot, sprite)
+        self._set_color(slot, sprite)
+        self._set_texture(slot, sprite)
+
+    def remove(self, sprite):
+        slot = self.slots.pop(sprite)
+        sprite.sprite_lists.remove(self)
+        pos = self.data[POS]
+        pos[slot * 2] = pos[slot * 2 + 1] = HIDDEN
+        size = self.data[SIZE]
+        size[slot * 2] = size[slot * 2 + 1] = 0
+        self.dirty[POS].add(slot)
+        self.dirty[SIZE].add(slot)
+        heappush(self.free, slot)
+
+    # Change notifications, called by arcade.Sprite on every list it belongs to
+    def update_location(self, sprite):
+        self._set_position(self.slots[sprite], sprite)
+
+    def update_position(self, sprite):
+        slot = self.slots[sprite]
+        self._set_position(slot, sprite)
+        self._set_angle(slot, sprite)
+        self._set_color(slot, sprite)
+
+    def update_size(self, sprite):
+        self._set_size(self.slots[sprite], sprite)
+
+    update_width = update_height = update_size
+
+    def update_angle(self, sprite):
+        self._set_angle(self.slots[sprite], sprite)
+
+    def update_color(self, sprite):
+        self._set_color(self.slots[sprite], sprite)
+
+    def update_texture(self, sprite):
+        slot = self.slots[sprite]
+        self._set_texture(slot, sprite)
+        # A new texture can change the sprite's size too
+        self._set_size(slot, sprite)
+
+    def _set_position(self, slot, sprite):
+        pos = self.data[POS]
+        pos[slot * 2], pos[slot * 2 + 1] = sprite.position
+        self.dirty[POS].add(slot)
+
+    def _set_size(self, slot, sprite):
+        size = self.data[SIZE]
+        size[slot * 2] = sprite.width
+        size[slot * 2 + 1] = sprite.height
+        self.dirty[SIZE].add(slot)
+
+    def _set_angle(self, slot, sprite):
+        self.data[ANGLE][slot] = sprite.angle
+        self.dirty[ANGLE].add(slot)
+
+    def _set_color(self, slot, sprite):
+        color = self.data[COLOR]
+        color[slot * 4:slot * 4 + 3] = array.array("B", [int(value) for value in sprite.color[:3]])
+        color[slot * 4 + 3] = int(sprite.alpha)
+        self.dirty[COLOR].add(slot)
+
+    def _set_texture(self, slot, sprite):
+        # Sprites showing a texture pair set pair and facing before the texture
+        # itself; any other sprite gets a cell of its own, read unmirrored
+        pair = getattr(sprite, "pair", None)
+        texture = sprite.texture if pair is None else pair[0]
+        cell = self.atlas_cells.get(texture.name)
+        if cell is None:
+            cell = self.atlas_cells[texture.name] = len(self.atlas_images)
+            self.atlas_images.append(padded(texture.image))
+            self.atlas_stale = True
+        self.cells[slot] = cell
+        self.facings[slot] = 0 if pair is None else sprite.facing
+        # The coordinates themselves are filled in at draw time, once the atlas is current
+        self.dirty[TEX].add(slot)
+
+    def _grow(self):
+        """ Double the capacity; the only time the buffers are reallocated """
+        extra = self.capacity
+        self.capacity *= 2
+        for data, (_, _, kind, width) in zip(self.data, LAYOUT):
+            data.extend(array.array(kind, [0]) * (extra * width))
+        self.cells.extend(array.array("l", [0]) * extra)
+        self.facings.extend(array.array("b", [0]) * extra)
+        if self.ctx is not None:
+            self._allocate()
+
+    def _allocate(self):
+        """ Create GPU buffers for the whole capacity from the CPU copies """
+        self.buffers = [self.ctx.buffer(data=data, usage="dynamic") for data in self.data]
+        content = []
+        for buffer, (name, layout, kind, _) in zip(self.buffers, LAYOUT):
+            content.append(gl.BufferDescription(buffer, layout, [name],
+                                                normalized=[name] if kind == "B" else None))
+        self.geometry = self.ctx.geometry(content)
+        # Everything was just uploaded, except texture coordinates that wait for the atlas
+        for attribute, dirty in enumerate(self.dirty):
+            if attribute != TEX:
+                dirty.clear()
+
+    def _build_atlas(self):
+        """ Pack every texture seen so far into one grid texture """
+        cell_width = max(image.width for image in self.atlas_images)
+        cell_height = max(image.height for image in self.atlas_images)
+        columns = math.ceil(math.sqrt(len(self.atlas_images)))
+        rows = math.ceil(len(self.atlas_images) / columns)
+        width, height = cell_width * columns, cell_height * rows
+        sheet = Image.new("RGBA", (width, height))
+        self.tex_coords = []
+        for index, image in enumerate(self.atlas_images):
+            column, row = index % columns, index // columns
+            sheet.paste(image, (column * cell_width, row * cell_height))
+            # Texture coordinates count rows from the bottom; skip the padding pixel
+            x = column * cell_width + 1
+            y = (rows - row - 1) * cell_height + 1 + cell_height - image.height
+            self.tex_coords.append([x / width, y / height,
+                                    (image.width - 2) / width, (image.height - 2) / height])
+        self.atlas = self.ctx.texture((width, height), components=4, data=sheet.tobytes())
+        self.atlas_stale = False
+        # Every cell may have moved, so every slot's coordinates are rewritten
+        self.dirty[TEX].update(self.slots.values())
+
+    def _flush(self):
+        """ Write the dirty slots to the GPU, one write per run of consecutive slots """
+        if self.dirty[TEX]:
+            tex = self.data[TEX]
+            for slot in self.dirty[TEX]:
+                x, y, width, height = self.tex_coords[self.cells[slot]]
+                if self.facings[slot]:
+                    # The right-facing texture is the left one flipped horizontally
+                    x, width = x + width, -width
+                tex[slot * 4:slot * 4 + 4] = array.array("f", [x, y, width, height])
+        for data, buffer, dirty, (_, _, _, width) in zip(self.data, self.buffers, self.dirty, LAYOUT):
+            if not dirty:
+                continue
+            for first, end in runs(dirty):
+                buffer.write(data[first * width:end * width], offset=first * width * data.itemsize)
+            dirty.clear()
+
+    def draw(self):
+        if not self.used:
+            return
+        if self.ctx is None:
+            self.ctx = arcade.get_window().ctx
+            self.program = self.ctx.sprite_list_program_cull
+            self._allocate()
+        if self.atlas_stale:
+            self._build_atlas()
+        self._flush()
+
+        self.ctx.enable(self.ctx.BLEND)
+        self.ctx.blend_func = self.ctx.BLEND_DEFAULT
+        self.atlas.use(0)
+        self.program["Texture"] = 0
+        self.program["TextureTransform"] = TEXTURE_TRANSFORM
+        # Hidden slots are culled by the geometry shader
+        self.geometry.render(self.program, mode=self.ctx.POINTS, vertices=self.used)
@@ -0,0 +1,106 @@
+""" Precomputed spawn schedules.
+
+A wave curve (see waves.json) is compiled offline into a table with one row per
+spawn: the tick it happens on, the wave it belongs to, the enemy type, the door
+(or crack, for Dragons) it comes through, and multipliers for the enemy's base
+health and damage. A World given a schedule walks the table with a cursor, so
+each spawn is a single row lookup and runs are repeatable for benchmarks and
+replays.
+
+The curve matches the built-in spawner: a wave every wave_interval + 1 ticks
+starting on the first tick, wave size start_count + count_step per wave
+(rounded down), and the enemy type drawn with the given weights. Spawns stop when
+the table runs out.
+
+    python schedule.py waves.json schedule.json --seed 1
+    python castle_battle.py --schedule schedule.json
+"""
+import argparse
+import json
+import random
+
+from layout import DOORS, CRACKS, ENEMY_NAMES
+
+# Row fields
+TICK, WAVE, TYPE, DOOR, HEALTH, DAMAGE = range(6)
+COLUMNS = ["tick", "wave", "type", "door", "health", "damage"]
+
+
+def compile_schedule(curve, doors, cracks, seed=None):
+    """ Turn a wave curve into spawn rows; doors and cracks are the spawn point counts """
+    unknown = sorted(set(curve["mix"]) - set(ENEMY_NAMES))
+    if unknown:
+        raise ValueError(f"unknown enemy types in mix: {unknown}; expected some of {ENEMY_NAMES}")
+    rng = random.Random(seed)
+    mix = list(curve["mix"].items())
+    total = sum(weight for _, weight in mix)
+    health_growth = curve.get("health_growth", 0.0)
+    damage_growth = curve.get("damage_growth", 0.0)
+
+    rows = []
+    enemy_count = curve["start_count"]
+    wave = 0
+    for tick in range(1, curve["ticks"] + 1, curve["wave_interval"] + 1):
+        # Same float accumulation as World.enemy_count, so wave sizes match exactly
+        enemy_count += curve["count_step"]
+        health = round((1 + health_growth) ** wave, 4)
+        damage = round((1 + damage_growth) ** wave, 4)
+        for _ in range(int(enemy_count)):
+            roll = rng.randint(1, total)
+            for enemy_type, weight in mix:
+                if roll <= weight:
+                    break
+                roll -= weight
+            door = rng.randrange(cracks if enemy_type == "Dragon" else doors)
+            rows.append([tick, wave, enemy_type, door, health, damage])
+        wave += 1
+    return rows
+
+
+class SpawnSchedule:
+    """ Compiled spawn rows, read-only so several worlds can share one """
+
+    def __init__(self, rows):
+        self.rows = [tuple(row) for row in rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as data:
+            table = json.load(data)
+        if table["columns"] != COLUMNS:
+            raise ValueError(f"{path}: expected columns {COLUMNS}, got {table['columns']}")
+        # Checked here so a typo fails on load, not when its spawn tick comes round
+        for index, row in enumerate(table["rows"]):
+            if row[TYPE] not in ENEMY_NAMES:
+                raise ValueError(f"{path}: row {index} has unknown enemy type {row[TYPE]!r}; "
+                                 f"expected one of {ENEMY_NAMES}")
+        return cls(table["rows"])
+
+    def save(self, path):
+        with open(path, "w") as data:
+            json.dump({"columns": COLUMNS, "rows": self.rows}, data, separators=(",", ":"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("curve", help="wave curve, e.g. waves.json")
+    parser.add_argument("output", help="schedule file to write")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--screens", type=int, default=1,
+                        help="level width in screens; each screen has its own doors and cracks")
+    args = parser.parse_args()
+
+    with open(args.curve) as data:
+        curve = json.load(data)
+    schedule = SpawnSchedule(compile_schedule(curve, len(DOORS) * args.screens,
+                                              len(CRACKS) * args.screens, args.seed))
+    schedule.save(args.output)
+    waves = schedule.rows[-1][WAVE] + 1 if schedule.rows else 0
+    print(f"{len(schedule)} spawns over {waves} waves written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+""" Stream game state to spectators over a local socket.
+
+The server side hangs off the game tick: after each World.tick() it encodes what
+changed since the previous tick and sends it to every connected subscriber.
+
+Wire format: every frame is a little-endian u32 length followed by
+    header   kind u8, tick u32, coins i32, spawns u16, deaths u16, updates u16
+    spawns   id u16, type u8, x i16, y i16, health u16
+    deaths   id u16
+    updates  id u16, flags u8, then [dx i8, dy i8] or [x i16, y i16], then [health u16]
+Positions and health are quantized to whole units. Only actors whose quantized
+state changed are sent, and small moves go as one-byte deltas, so the cost of a
+tick follows the number of actors that moved, not the number that exist.
+A keyframe resends everything and is used when a subscriber joins.
+
+    python castle_battle.py --serve 7777          # play and publish
+    python spectator.py watch --port 7777         # render the stream
+    python spectator.py selftest                  # headless end-to-end run on localhost
+"""
+import argparse
+import socket
+import struct
+import time
+
+HOST = "127.0.0.1"
+PORT = 7777
+KEYFRAME_INTERVAL = 600
+# Drop subscribers that fall this far behind instead of buffering forever
+MAX_BACKLOG = 1 << 20
+
+# Frame kinds
+DELTA = 0
+KEYFRAME = 1
+GAME_OVER = 2
+
+# Update flags
+POS_DELTA = 1
+POS_FULL = 2
+HEALTH = 4
+
+ACTOR_TYPES = ["Player", "Orc", "Goblin", "Skeleton", "Cyclops", "Dragon",
+               "Wizard", "Arrow", "Blast", "Swing"]
+TYPE_CODES = {name: code for code, name in enumerate(ACTOR_TYPES)}
+UNKNOWN_TYPE = 255
+# Actor ids are u16 and 0 is never used
+MAX_ID = 65535
+# Selftest crowd: enemies spawned at once, ticks they live, and the encode time
+# one actor may cost
+CROWD = 300
+CROWD_TICKS = 120
+MAX_ENCODE_US_PER_ACTOR = 20.0
+
+LENGTH = struct.Struct("<I")
+HEADER = struct.Struct("<BIiHHH")
+SPAWN = struct.Struct("<HBhhH")
+DEATH = struct.Struct("<H")
+UPDATE = struct.Struct("<HB")
+POS_SMALL = struct.Struct("<bb")
+POS_LARGE = struct.Struct("<hh")
+HEALTH_VALUE = struct.Struct("<H")
+
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+def quantize(actor):
+    """ Whole-pixel position and whole-point health, clamped to the wire ranges """
+    x = round(_clamp(actor.center_x, -32768, 32767))
+    y = round(_clamp(actor.center_y, -32768, 32767))
+    health = round(_clamp(actor.health, 0, 65535))
+    return x, y, health
+
+
+class DeltaEncoder:
+    """ Turns successive World ticks into delta frames """
+
+    def __init__(self):
+        self.ids = {}
+        # Ids of actors still alive; the counter wraps, so these are skipped
+        self.in_use = set()
+        self.last = {}
+        self.next_id = 1
+        self.tick = 0
+
+    def _new_id(self):
+        if len(self.in_use) >= MAX_ID:
+            raise OverflowError(f"more than {MAX_ID} live actors")
+        net_id = self.next_id
+        while net_id in self.in_use:
+            net_id = net_id % MAX_ID + 1
+        self.next_id = net_id % MAX_ID + 1
+        self.in_use.add(net_id)
+        return net_id
+
+    def encode(self, world, keyframe=False):
+        self.tick += 1
+        if keyframe:
+            self.last = {}
+        spawns = []
+        updates = []
+        alive = set()
+        for actor in world.actor_list:
+            net_id = self.ids.get(actor)
+            if net_id is None:
+                net_id = self._new_id()
+                self.ids[actor] = net_id
+            alive.add(actor)
+            state = quantize(actor)
+            previous = self.last.get(net_id)
+            if previous is None:
+                code = TYPE_CODES.get(type(actor).__name__, UNKNOWN_TYPE)
+                spawns.append(SPAWN.pack(net_id, code, *state))
+            elif previous != state:
+                updates.append(self._update(net_id, previous, state))
+            self.last[net_id] = state
+
+        deaths = []
+        for actor in [actor for actor in self.ids if actor not in alive]:
+            net_id = self.ids.pop(actor)
+            self.in_use.discard(net_id)
+            self.last.pop(net_id, None)
+            if not keyframe:
+                deaths.append(DEATH.pack(net_id))
+
+        kind = KEYFRAME if keyframe else DELTA
+        if world.game_over:
+            kind |= GAME_OVER
+        header = HEADER.pack(kind, self.tick, world.player_sprite.coins,
+                             len(spawns), len(deaths), len(updates))
+        return b"".join([header] + spawns + deaths + updates)
+
+    @staticmethod
+    def _update(net_id, previous, state):
+        flags = 0
+        parts = []
+        dx = state[0] - previous[0]
+        dy = state[1] - previous[1]
+        if dx or dy:
+            if -128 <= dx <= 127 and -128 <= dy <= 127:
+                flags |= POS_DELTA
+                parts.append(POS_SMALL.pack(dx, dy))
+            else:
+                flags |= POS_FULL
+                parts.append(POS_LARGE.pack(state[0], state[1]))
+        if state[2] != previous[2]:
+            flags |= HEALTH
+            parts.append(HEALTH_VALUE.pack(state[2]))
+        return UPDATE.pack(net_id, flags) + b"".join(parts)
+
+
+class DeltaDecoder:
+    """ Rebuilds actor state from a stream of frames """
+
+    def __init__(self):
+        # id -> [type code, x, y, health]
+        self.actors = {}
+        self.tick = 0
+        self.coins = 0
+        self.game_over = False
+
+    def apply(self, frame):
+        """ Apply one frame; returns (spawned ids, dead ids) """
+        kind, self.tick, self.coins, n_spawn, n_death, n_update = HEADER.unpack_from(frame)
+        self.game_over = bool(kind & GAME_OVER)
+        offset = HEADER.size
+        if kind & KEYFRAME:
+            self.actors = {}
+        spawned = []
+        for _ in range(n_spawn):
+            net_id, code, x, y, health = SPAWN.unpack_from(frame, offset)
+            offset += SPAWN.size
+            self.actors[net_id] = [code, x, y, health]
+            spawned.append(net_id)
+        dead = []
+        for _ in range(n_death):
+            net_id, = DEATH.unpack_from(frame, offset)
+            offset += DEATH.size
+            self.actors.pop(net_id, None)
+            dead.append(net_id)
+        for _ in range(n_update):
+            net_id, flags = UPDATE.unpack_from(frame, offset)
+            offset += UPDATE.size
+            actor = self.actors[net_id]
+            if flags & POS_DELTA:
+                dx, dy = POS_SMALL.unpack_from(frame, offset)
+                offset += POS_SMALL.size
+                actor[1] += dx
+                actor[2] += dy
+            elif flags & POS_FULL:
+                actor[1], actor[2] = POS_LARGE.unpack_from(frame, offset)
+                offset += POS_LARGE.size
+            if flags & HEALTH:
+                actor[3], = HEALTH_VALUE.unpack_from(frame, offset)
+                offset += HEALTH_VALUE.size
+        return spawned, dead
+
+    def player(self):
+        for code, x, y, health in self.actors.values():
+            if code == TYPE_CODES["Player"]:
+                return x, y, health
+        return None
+
+
+class StateServer:
+    """ Publishes a World to local subscribers, one frame per tick """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        # socket -> unsent bytes
+        self.subscribers = {}
+        self.encoder = DeltaEncoder()
+        self.world = None
+        self.need_keyframe = True
+
+        # Measurements
+        self.frames = 0
+        self.total_bytes = 0
+        self.total_encode = 0.0
+        self.last_bytes = 0
+        self.last_encode = 0.0
+        self.last_actors = 0
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.subscribers[conn] = bytearray()
+            self.need_keyframe = True
+
+    def publish(self, world):
+        """ Encode this tick and push it to every subscriber without blocking """
+        self._accept()
+        if not self.subscribers:
+            # Nothing is encoded while nobody watches; the next viewer gets a keyframe
+            self.need_keyframe = True
+            return
+        if world is not self.world:
+            self.world = world
+            self.need_keyframe = True
+        keyframe = self.need_keyframe or self.encoder.tick % KEYFRAME_INTERVAL == 0
+        self.need_keyframe = False
+
+        start = time.perf_counter()
+        frame = self.encoder.encode(world, keyframe)
+        self.last_encode = time.perf_counter() - start
+        self.last_bytes = len(frame)
+        self.last_actors = len(world.actor_list)
+        self.frames += 1
+        self.total_bytes += self.last_bytes
+        self.total_encode += self.last_encode
+
+        message = LENGTH.pack(len(frame)) + frame
+        for conn, backlog in list(self.subscribers.items()):
+            backlog += message
+            try:
+                sent = conn.send(backlog)
+                del backlog[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._drop(conn)
+                continue
+            if len(backlog) > MAX_BACKLOG:
+                self._drop(conn)
+
+    def _drop(self, conn):
+        del self.subscribers[conn]
+        conn.close()
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {"frames": self.frames,
+                "subscribers": len(self.subscribers),
+                "last_bytes": self.last_bytes,
+                "last_actors": self.last_actors,
+                "mean_bytes": self.total_bytes / frames,
+                "mean_encode_us": self.total_encode / frames * 1e6}
+
+    def close(self):
+        for conn in list(self.subscribers):
+            self._drop(conn)
+        self.listener.close()
+
+
+class SpectatorClient:
+    """ Receives frames from a StateServer and keeps a decoded copy of the state """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setblocking(False)
+        self.buffer = bytearray()
+        self.decoder = DeltaDecoder()
+        self.frames = 0
+        self.closed = False
+
+    def poll(self):
+        """ Apply every complete frame received so far; returns the number applied """
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                self.closed = True
+                break
+            self.buffer += data
+        applied = 0
+        while len(self.buffer) >= LENGTH.size:
+            length, = LENGTH.unpack_from(self.buffer)
+            if len(self.buffer) < LENGTH.size + length:
+                break
+            frame = bytes(self.buffer[LENGTH.size:LENGTH.size + length])
+            del self.buffer[:LENGTH.size + length]
+            self.decoder.apply(frame)
+            applied += 1
+        self.frames += applied
+        return applied
+
+    def close(self):
+        self.sock.close()
+
+
+def watch(host, port):
+    """ Reference spectator: draws the decoded stream in a window """
+    # arcade is only needed to render, so headless users of this module never import it
+    import arcade
+    from castle_battle import SCREEN_WIDTH, SCREEN_HEIGHT, SPRITE_SCALING
+
+    images = {"Player": ("images/Knight.png", SPRITE_SCALING / 4),
+              "Orc": ("images/orc.png", SPRITE_SCALING / 3.25),
+              "Goblin": ("images/goblin.png", SPRITE_SCALING / 4),
+              "Skeleton": ("images/skeleton.png", SPRITE_SCALING / 3.25),
+              "Cyclops": ("images/cyclops.png", SPRITE_SCALING / 2),
+              "Dragon": ("images/dragon.png", SPRITE_SCALING / 1.5),
+              "Wizard": ("images/wizard.png", SPRITE_SCALING / 3),
+              "Arrow": ("images/arrow.png", 0.1),
+              "Blast": ("images/wizard_blast.png", 0.1),
+              "Swing": ("images/swing.png", 1.5)}
+
+    class SpectatorWindow(arcade.Window):
+        def __init__(self):
+            super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, "CTR Battle Arena - Spectator")
+            self.client = SpectatorClient(host, port)
+            self.background = arcade.load_texture("images/castle_doors.png")
+            self.textures = {TYPE_CODES[name]: (arcade.load_texture(img), scale)
+                             for name, (img, scale) in images.items()}
+
+        def on_update(self, delta_time):
+            self.client.poll()
+            if self.client.closed:
+                arcade.close_window()
+
+        def on_draw(self):
+            arcade.start_render()
+            arcade.draw_lrwh_rectangle_textured(0, -SCREEN_WIDTH * .12,
+                                                SCREEN_WIDTH, SCREEN_HEIGHT * 1.25,
+                                                self.background)
+            decoder = self.client.decoder
+            for code, x, y, health in decoder.actors.values():
+                texture = self.textures.get(code)
+                if texture is None:
+                    continue
+                arcade.draw_scaled_texture_rectangle(x, y, texture[0], texture[1])
+                if code not in (TYPE_CODES["Player"], TYPE_CODES["Arrow"],
+                                TYPE_CODES["Blast"], TYPE_CODES["Swing"]):
+                    arcade.draw_text(f"{health}", x - 10, y + 20, arcade.color.RED, 14)
+            player = decoder.player()
+            if player is not None:
+                arcade.draw_text(f"Health: {player[2]}", 10, 970, arcade.color.RED, 20)
+            arcade.draw_text(f"Coins: {decoder.coins}", 10, 940, arcade.color.YELLOW, 20)
+            arcade.draw_text(f"Tick: {decoder.tick}", 1600, 960, arcade.color.WHITE, 20)
+            if decoder.game_over:
+                arcade.draw_text("Game Over", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
+                                 arcade.color.BLACK, font_size=50, anchor_x="center")
+
+    SpectatorWindow()
+    arcade.run()
+
+
+def serve_headless(port, ticks, seed):
+    """ Run a World without a window and publish it """
+    from castle_battle import World
+
+    world = World(seed=seed)
+    server = StateServer(port=port)
+    print(f"serving on {HOST}:{server.port}")
+    try:
+        for _ in range(ticks):
+            world.tick()
+            server.publish(world)
+            time.sleep(1 / 60)
+    finally:
+        server.close()
+    return server.stats()
+
+
+def _check_sync(world, server, client):
+    """ Compare the client's decoded actors with the world, id by id """
+    # Duplicated or missing actors cannot hide behind equal positions this way
+    ids = server.encoder.ids
+    expected = {ids[actor]: [TYPE_CODES.get(type(actor).__name__, UNKNOWN_TYPE), *quantize(actor)]
+                for actor in world.actor_list}
+    received = client.decoder.actors
+    assert len(received) == len(world.actor_list), \
+        f"decoded {len(received)} actors, the world has {len(world.actor_list)}"
+    assert expected == received, "decoded actors do not match the world"
+
+
+def _step(world, server, client):
+    world.tick()
+    server.publish(world)
+    client.poll()
+
+
+def _settle(client):
+    """ Give the last frames time to cross localhost """
+    time.sleep(0.1)
+    client.poll()
+
+
+def selftest(ticks, seed):
+    """ Server and client in one process over localhost; checks the decoded state
+
+    After the normal game, a crowd of CROWD Goblins is spawned at once, lives for
+    CROWD_TICKS ticks and is killed in one tick. The payload per actor must stay
+    within the largest per-actor record of the wire format, and the mean encode
+    time per actor under MAX_ENCODE_US_PER_ACTOR, however many actors there are.
+    """
+    from castle_battle import World, Goblin
+
+    world = World(seed=seed)
+    # Keep the player out of reach so the actor count keeps growing
+    world.player_sprite.health = float("inf")
+    server = StateServer(port=0)
+    client = SpectatorClient(port=server.port)
+    try:
+        for tick in range(1, ticks + 1):
+            _step(world, server, client)
+            if tick % 500 == 0:
+                stats = server.stats()
+                print(f"tick {tick:6}: actors {stats['last_actors']:4}  "
+                      f"bytes {stats['last_bytes']:6}  mean bytes {stats['mean_bytes']:8.1f}  "
+                      f"encode {stats['mean_encode_us']:7.1f}us")
+        _settle(client)
+        _check_sync(world, server, client)
+        print(f"ok: {client.frames} frames, {len(client.decoder.actors)} actors in sync")
+
+        crowd = [world.spawn_enemy(Goblin) for _ in range(CROWD)]
+        # An update with a full position and health is the largest per-actor record
+        record = UPDATE.size + POS_LARGE.size + HEALTH_VALUE.size
+        worst_bytes = encode = 0.0
+        encoded = 0
+        for _ in range(CROWD_TICKS):
+            _step(world, server, client)
+            actors = server.last_actors
+            worst_bytes = max(worst_bytes, (server.last_bytes - HEADER.size) / actors)
+            encode += server.last_encode
+            encoded += actors
+        encode_us = encode * 1e6 / encoded
+        _settle(client)
+        _check_sync(world, server, client)
+        peak = len(world.actor_list)
+
+        for enemy in crowd:
+            enemy.health = 0
+        _step(world, server, client)
+        _settle(client)
+        _check_sync(world, server, client)
+        assert not any(enemy in server.encoder.ids for enemy in crowd), "killed actors still have ids"
+        print(f"ok: crowd of {peak} actors spawned, in sync and killed; worst {worst_bytes:.2f} "
+              f"bytes/actor (limit {record}), mean {encode_us:.2f}us encode/actor "
+              f"(limit {MAX_ENCODE_US_PER_ACTOR})")
+        assert worst_bytes <= record, f"{worst_bytes:.2f} bytes per actor, the format allows {record}"
+        assert encode_us <= MAX_ENCODE_US_PER_ACTOR, \
+            f"encoding took {encode_us:.2f}us per actor, over {MAX_ENCODE_US_PER_ACTOR}us"
+    finally:
+        client.close()
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["watch", "serve", "selftest"])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "watch":
+        watch(args.host, args.port)
+    elif args.mode == "serve":
+        print(serve_headless(args.port, args.ticks, args.seed))
+    else:
+        selftest(args.ticks, args.seed)
+
+
+if __name__ == "__main__":
+    main()
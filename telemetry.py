@@ -0,0 +1,164 @@
+""" Per-tick game metrics streamed to an append-only file.
+
+TelemetrySink.record() is called from the game loop after every World.tick(). It
+folds the tick into a running sample and, every N ticks, hands one record to a
+background thread through a bounded queue. If the writer falls behind, records are
+dropped and counted rather than stalling the game. Each record is one JSON line:
+
+    tick, time            world tick and seconds since the sink was opened
+    actors                live actor count by type name
+    projectiles           live Arrows and Blasts
+    enemy_count           the spawner's current wave size
+    spawns                enemy type names spawned since the previous record
+    coins_earned          coins from kills since the previous record
+    damage_dealt/taken    player damage since the previous record
+    frame_time, tick_time mean and max seconds over the sampled ticks
+    dropped               records lost to a full queue so far
+
+load_run() reads a file back into one array per numeric column.
+
+    python castle_battle.py --telemetry run.jsonl --telemetry-every 10
+    python telemetry.py run.jsonl
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+
+QUEUE_SIZE = 4096
+PROJECTILES = ("Arrow", "Blast")
+_STOP = object()
+
+
+class TelemetrySink:
+    """ Opt-in writer of per-tick game metrics """
+
+    def __init__(self, path, every=1, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.every = max(1, every)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.start = time.perf_counter()
+        self._reset_sample()
+        self._player = None
+        self._dealt = self._taken = 0
+        self.thread = threading.Thread(target=self._write, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def _reset_sample(self):
+        self.samples = 0
+        self.spawns = []
+        self.coins_earned = 0
+        self.frame_total = self.frame_max = 0.0
+        self.tick_total = self.tick_max = 0.0
+
+    def record(self, world, frame_time):
+        """ Account for the tick the world just ran; never blocks """
+        player = world.player_sprite
+        if player is not self._player:
+            # New game: the new player's damage counters start from zero
+            self._player = player
+            self._dealt = self._taken = 0
+
+        self.samples += 1
+        self.spawns.extend(world.spawned)
+        self.coins_earned += world.coins_earned
+        self.frame_total += frame_time
+        self.frame_max = max(self.frame_max, frame_time)
+        self.tick_total += world.tick_time
+        self.tick_max = max(self.tick_max, world.tick_time)
+        if world.ticks % self.every:
+            return
+
+        actors = Counter(type(actor).__name__ for actor in world.actor_list)
+        entry = {"tick": world.ticks,
+                 "time": time.perf_counter() - self.start,
+                 "actors": dict(actors),
+                 "projectiles": sum(actors[name] for name in PROJECTILES),
+                 "enemy_count": world.enemy_count,
+                 "spawns": self.spawns,
+                 "coins_earned": self.coins_earned,
+                 "damage_dealt": player.damage_dealt - self._dealt,
+                 "damage_taken": player.damage_taken - self._taken,
+                 "frame_time": self.frame_total / self.samples,
+                 "frame_time_max": self.frame_max,
+                 "tick_time": self.tick_total / self.samples,
+                 "tick_time_max": self.tick_max,
+                 "dropped": self.dropped}
+        self._dealt = player.damage_dealt
+        self._taken = player.damage_taken
+        self._reset_sample()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        with open(self.path, "a") as log:
+            while True:
+                entry = self.queue.get()
+                if entry is _STOP:
+                    break
+                log.write(json.dumps(entry, separators=(",", ":")))
+                log.write("\n")
+                if self.queue.empty():
+                    log.flush()
+
+    def close(self):
+        """ Write out everything still queued and stop the writer """
+        self.queue.put(_STOP)
+        self.thread.join()
+
+
+def load_run(path):
+    """ Read a telemetry file into columns: name -> array('d') plus 'spawns' as lists.
+
+    Actor counts become one column per type, e.g. 'actors.Goblin'.
+    """
+    entries = []
+    with open(path) as log:
+        for line in log:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+
+    actor_types = sorted({name for entry in entries for name in entry["actors"]})
+    columns = {}
+    for entry in entries:
+        for key, value in entry.items():
+            if key not in ("actors", "spawns"):
+                columns.setdefault(key, array("d"))
+    for name in actor_types:
+        columns["actors." + name] = array("d")
+    for key, column in columns.items():
+        if key.startswith("actors."):
+            name = key[len("actors."):]
+            column.extend(entry["actors"].get(name, 0) for entry in entries)
+        else:
+            column.extend(entry.get(key, 0) for entry in entries)
+    columns["spawns"] = [entry["spawns"] for entry in entries]
+    return columns
+
+
+def summarize(path):
+    run = load_run(path)
+    records = len(run["spawns"])
+    if not records:
+        print("no records")
+        return
+    frame = run["frame_time_max"]
+    worst = max(range(records), key=frame.__getitem__)
+    print(f"{records} records, ticks {run['tick'][0]:.0f}-{run['tick'][-1]:.0f}, "
+          f"{run['dropped'][-1]:.0f} dropped")
+    print(f"mean frame {sum(run['frame_time']) / records * 1000:.2f}ms, "
+          f"mean tick {sum(run['tick_time']) / records * 1000:.2f}ms")
+    actors = {key[len("actors."):]: run[key][worst] for key in run if key.startswith("actors.")}
+    print(f"slowest frame {frame[worst] * 1000:.2f}ms at tick {run['tick'][worst]:.0f}: "
+          f"{run['projectiles'][worst]:.0f} projectiles, actors {actors}")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1])